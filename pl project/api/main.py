@@ -1,59 +1,388 @@
-from fastapi import FastAPI
-import joblib
-import pandas as pd
-import os
-
-app = FastAPI()
-
-# --- PATH SETUP ---
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-model_path = os.path.join(BASE_DIR, "models", "rolling_rf_model.joblib")
-data_path = os.path.join(BASE_DIR, "database", "rolling_data.csv")
-
-# --- LOAD RESOURCES ---
-if not os.path.exists(model_path) or not os.path.exists(data_path):
-    raise FileNotFoundError("Model or Data not found. Run train_rolling.py first.")
-
-model = joblib.load(model_path)
-rolling_data = pd.read_csv(data_path)
-
-@app.get("/")
-def home():
-    return {"status": "Advanced Predictor Online"}
-
-@app.get("/predict/{home_id}/{away_id}")
-def predict_match(home_id: int, away_id: int):
-    # 1. Get stats for BOTH teams (to send to frontend for graphing)
-    h_stats = rolling_data[rolling_data["home_team_id"] == home_id].iloc[-1:]
-    a_stats = rolling_data[rolling_data["home_team_id"] == away_id].iloc[-1:]
-    
-    if h_stats.empty or a_stats.empty:
-        return {"error": "Insufficient data"}
-    
-    # 2. Prepare Input for Model (Home Perspective)
-    cols = ["gf_rolling", "ga_rolling", "xg_rolling", "xga_rolling", 
-            "poss_rolling", "sh_rolling", "sot_rolling", "dist_rolling"]
-    
-    input_data = h_stats[cols].copy()
-    input_data["home_team_id"] = home_id
-    input_data["away_team_id"] = away_id
-    input_data["venue_code"] = 1 
-    
-    # 3. Get Prediction AND Probabilities
-    pred_code = model.predict(input_data)[0]
-    probabilities = model.predict_proba(input_data)[0] # Returns [prob_loss, prob_draw, prob_win]
-    
-    result_map = {0: "Away Win", 1: "Draw", 2: "Home Win"}
-    
-    return {
-        "prediction": result_map[pred_code],
-        "probs": {
-            "away": round(probabilities[0], 2),
-            "draw": round(probabilities[1], 2),
-            "home": round(probabilities[2], 2)
-        },
-        "stats": {
-            "home": h_stats[cols].to_dict(orient="records")[0],
-            "away": a_stats[cols].to_dict(orient="records")[0]
-        }
-    }
\ No newline at end of file
+from fastapi import FastAPI, Query, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import datetime
+import os
+import sys
+import threading
+import time
+
+app = FastAPI()
+
+# --- PATH SETUP ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from predictor import Predictor, db_path, model_path, packed_path, ratings_path, explain_path, current_features
+from simulate import load_season, fill_unknown, simulate_season, team_names
+from cache import PredictionCache, file_signature
+from metrics import Registry
+from batching import MicroBatcher
+from live import result_rows, store_result, apply_results, RetrainScheduler
+
+# --- SETTINGS ---
+RELOAD_INTERVAL = float(os.environ.get("PL_RELOAD_INTERVAL", 2.0)) # Seconds between file checks, 0 = off
+USE_MMAP = os.environ.get("PL_MMAP", "0") == "1" # Memory-map the packed forest so workers share its pages
+USE_PACKED = os.environ.get("PL_PACKED", "1") == "1" # Use the packed forest export when it exists
+ADMIN_TOKEN = os.environ.get("PL_ADMIN_TOKEN") # Required by /admin/reload when set
+TIMING_HEADER = os.environ.get("PL_TIMING_HEADER", "0") == "1" # Server-Timing header on prediction responses
+MICROBATCH = os.environ.get("PL_MICROBATCH", "1") == "1" # Score concurrent /predict calls together
+BATCH_MAX = int(os.environ.get("PL_BATCH_MAX", 64)) # Most requests in one forest pass
+BATCH_WAIT = float(os.environ.get("PL_BATCH_WAIT_MS", 2.0)) / 1000 # Collect time while a batch is already running
+RETRAIN_DELAY = float(os.environ.get("PL_RETRAIN_DELAY", 30.0)) # Quiet seconds after POST /results before retraining, 0 = off
+
+
+# --- METRICS ---
+# Scraped from /metrics; the stage split is what tells a slow forest from slow JSON
+metrics = Registry()
+REQUESTS = metrics.counter("pl_requests_total", "Requests handled, by route and outcome", ["route", "outcome"])
+BATCH_FIXTURES = metrics.counter("pl_batch_fixtures_total", "Fixtures scored by /predict/batch, by outcome", ["outcome"])
+REQUEST_SECONDS = metrics.histogram("pl_request_seconds", "Time spent in the route handler", ["route"])
+STAGE_SECONDS = metrics.histogram("pl_predict_stage_seconds",
+                                  "Prediction time per stage: lookup, assemble, forest, format, serialize",
+                                  ["route", "stage"])
+CACHE_LOOKUPS = metrics.counter("pl_prediction_cache_lookups_total", "/predict cache lookups", ["result"])
+CACHE_ENTRIES = metrics.gauge("pl_prediction_cache_entries", "Predictions currently cached")
+EXPLAIN_LOOKUPS = metrics.counter("pl_explain_lookups_total", "/explain lookups: saved by training, cached, or computed",
+                                  ["result"])
+MODEL_LOADS = metrics.counter("pl_model_loads_total", "Model + feature loads, by result", ["result"])
+MODEL_LOAD_SECONDS = metrics.gauge("pl_model_load_seconds", "Time the latest successful load took")
+MODEL_INFO = metrics.gauge("pl_model_info", "Version being served", ["model", "features", "evaluator"])
+RESULTS = metrics.counter("pl_results_total", "Results posted to /results, by outcome", ["outcome"])
+RETRAINS = metrics.counter("pl_retrains_total", "Background retrains after /results, by result", ["result"])
+BATCH_SIZE = metrics.histogram("pl_microbatch_size", "Requests per micro-batch forest pass",
+                               buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+
+def record(route, outcome, started, timings=None, response=None):
+    """Counts one request, observes its stage timings and adds the optional header."""
+    elapsed = time.perf_counter() - started
+    REQUESTS.inc(route, outcome)
+    REQUEST_SECONDS.observe(elapsed, route)
+    if timings:
+        for stage, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, route, stage)
+        if TIMING_HEADER and response is not None:
+            parts = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in timings.items()]
+            response.headers["Server-Timing"] = ", ".join(parts + [f"total;dur={elapsed * 1000:.3f}"])
+
+
+def serialize(content, timings):
+    # Returning a ready JSONResponse skips FastAPI's own encoding, so this is the whole cost
+    start = time.perf_counter()
+    response = JSONResponse(content)
+    timings["serialize"] = time.perf_counter() - start
+    return response
+
+
+# --- LOAD RESOURCES ---
+def load_predictor():
+    try:
+        res = Predictor(model_path, current_features(), USE_MMAP, packed_path if USE_PACKED else None, ratings_path, db_path,
+                        explain_path)
+    except Exception:
+        MODEL_LOADS.inc("failed")
+        raise
+    MODEL_LOADS.inc("ok")
+    MODEL_LOAD_SECONDS.set(res.load_seconds)
+    MODEL_INFO.replace({(res.model_fp, res.data_fp, res.evaluator): 1})
+    return res
+
+
+current = load_predictor()
+_reload_lock = threading.Lock() # Also guards live_results: every version swap goes through it
+live_results = [] # (seq, rows) posted to /results that no finished retrain has covered yet
+live_seq = 0
+
+
+def reload_resources(force=False):
+    """Builds the new version off to the side, then swaps it in. Returns True if swapped."""
+    global current
+    with _reload_lock:
+        signature = (file_signature(model_path), file_signature(current_features()))
+        if not force and signature == current.signature:
+            return False
+        fresh = load_predictor()
+        if live_results:
+            fresh = apply_results(fresh, db_path, [rows for _, rows in live_results])
+        current = fresh
+    # Cache keys carry the fingerprints, so old entries can't be hit; clearing just frees memory
+    prediction_cache.clear()
+    explain_cache.clear()
+    print(f"🔄 Reloaded model {fresh.model_fp} ({fresh.evaluator}) / features {fresh.data_fp}")
+    return True
+
+
+def watch_files():
+    # Reload once a changed file has stopped changing for one interval (train_rolling.py
+    # replaces files atomically, but an --incremental append can still be in progress)
+    seen = current.signature
+    while True:
+        time.sleep(RELOAD_INTERVAL)
+        try:
+            signature = (file_signature(model_path), file_signature(current_features()))
+            if signature != current.signature and signature == seen:
+                reload_resources()
+            seen = signature
+        except Exception as e:
+            # Files mid-write or missing: keep serving the version we have, retry next check
+            print(f"⚠️ Reload skipped: {e}")
+
+
+# --- PREDICTION CACHE ---
+prediction_cache = PredictionCache(int(os.environ.get("PL_CACHE_SIZE", 4096)))
+# Explanations computed on request (pairings training didn't save), same keys and LRU bound
+explain_cache = PredictionCache(int(os.environ.get("PL_EXPLAIN_CACHE_SIZE", 1024)))
+
+if RELOAD_INTERVAL > 0:
+    threading.Thread(target=watch_files, name="model-watcher", daemon=True).start()
+
+
+# --- BACKGROUND RETRAIN ---
+def first_date(rows):
+    return datetime.datetime.strptime(rows["date"].min(), "%Y-%m-%d")
+
+
+def retrain_plan():
+    """(full rebuild?, last result seq the run will see). Runs as the retrain starts."""
+    with _reload_lock:
+        oldest = min(first_date(rows) for _, rows in live_results) if live_results else None
+        done_through = current.processed_through
+        seq = live_seq
+    # --incremental only picks up matches after the last one it processed
+    return done_through is None or (oldest is not None and oldest <= done_through), seq
+
+
+def retrain_finished(ok, seq, error):
+    if not ok:
+        RETRAINS.inc("failed")
+        print(f"⚠️ Background retrain failed, still serving live updates: {error}")
+        return
+    RETRAINS.inc("ok")
+    with _reload_lock:
+        # Everything posted before the run started is in the new files now
+        live_results[:] = [(s, rows) for s, rows in live_results if s > seq]
+    reload_resources(force=True)
+
+
+retrainer = RetrainScheduler(RETRAIN_DELAY, retrain_plan, retrain_finished) if RETRAIN_DELAY > 0 else None
+
+
+# --- MICRO-BATCHING ---
+def score_queued(items):
+    """Scores (version, home_id, away_id, arrived) items, one pass per model version.
+
+    Each result comes back with its stage timings; the forest stages are shared by
+    the whole batch, "queue" is how long that request waited for it.
+    """
+    started = time.perf_counter()
+    out = [None] * len(items)
+    versions = {}
+    for i, item in enumerate(items):
+        versions.setdefault(item[0], []).append(i) # Almost always one, unless a reload landed mid-queue
+    for res, idx in versions.items():
+        timings = {}
+        results = res.score_fixtures([items[i][1] for i in idx], [items[i][2] for i in idx], timings=timings)
+        BATCH_SIZE.observe(len(idx))
+        for i, result in zip(idx, results):
+            out[i] = (result, {"queue": started - items[i][3], **timings})
+    return out
+
+
+batcher = MicroBatcher(score_queued, BATCH_MAX, BATCH_WAIT) if MICROBATCH else None
+
+
+class Fixture(BaseModel):
+    home_id: int
+    away_id: int
+
+
+class SideResult(BaseModel):
+    # Bounded here: a bad value would go straight into SQLite, the ratings and the next retrain
+    goals: int = Field(ge=0)
+    xg: Optional[float] = Field(None, ge=0)
+    poss: Optional[float] = Field(None, ge=0, le=100)
+    sh: Optional[float] = Field(None, ge=0)
+    sot: Optional[float] = Field(None, ge=0)
+    dist: Optional[float] = Field(None, ge=0)
+
+
+class MatchResult(BaseModel):
+    date: datetime.date
+    home_id: int
+    away_id: int
+    home: SideResult
+    away: SideResult
+    round: Optional[str] = None
+    season: Optional[int] = None # Worked out from the date when left out
+
+
+class FixtureBatch(BaseModel):
+    fixtures: List[Fixture]
+    include_stats: bool = False # Radar chart stats are only needed for single matches
+
+
+@app.get("/")
+def home():
+    return {"status": "Advanced Predictor Online"}
+
+@app.get("/predict/{home_id}/{away_id}")
+async def predict_match(home_id: int, away_id: int):
+    started = time.perf_counter()
+    res = current
+    key = (home_id, away_id, res.model_fp, res.data_fp)
+    timings = {}
+    result = prediction_cache.get(key)
+    if result is None:
+        CACHE_LOOKUPS.inc("miss")
+        if batcher is not None:
+            result, timings = await batcher.submit((res, home_id, away_id, started))
+        else:
+            result = await run_in_threadpool(res.predict_match, home_id, away_id, timings)
+        prediction_cache.put(key, result)
+    else:
+        CACHE_LOOKUPS.inc("hit")
+    response = serialize(result, timings)
+    record("predict", "insufficient_data" if "error" in result else "ok", started, timings, response)
+    return response
+
+@app.get("/explain/{home_id}/{away_id}")
+async def explain_match(home_id: int, away_id: int):
+    # Why the forest made its call: TreeSHAP contribution of every model input to each outcome
+    started = time.perf_counter()
+    res = current
+    result = res.stored_explanation(home_id, away_id)
+    if result is not None:
+        EXPLAIN_LOOKUPS.inc("saved")
+    else:
+        key = (home_id, away_id, res.model_fp, res.data_fp)
+        result = explain_cache.get(key)
+        if result is None:
+            EXPLAIN_LOOKUPS.inc("computed")
+            result = await run_in_threadpool(res.explain_match, home_id, away_id)
+            explain_cache.put(key, result)
+        else:
+            EXPLAIN_LOOKUPS.inc("cached")
+    record("explain", "insufficient_data" if "error" in result else "ok", started)
+    return result
+
+@app.get("/cache")
+def cache_stats():
+    res = current
+    return {**prediction_cache.stats(), "model": res.model_fp, "features": res.data_fp, "evaluator": res.evaluator,
+            "explain": explain_cache.stats()}
+
+@app.post("/admin/reload")
+def admin_reload(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        swapped = reload_resources(force=force)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Reload failed, still serving old version: {e}")
+    res = current
+    return {"reloaded": swapped, "model": res.model_fp, "features": res.data_fp, "loaded_at": res.loaded_at}
+
+@app.post("/results")
+def post_result(result: MatchResult, x_admin_token: Optional[str] = Header(None)):
+    # Stored, then live in predictions as soon as this returns; the model itself
+    # catches up in a background retrain once results stop arriving
+    global current, live_seq
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if result.home_id == result.away_id:
+        raise HTTPException(status_code=422, detail="home_id and away_id must differ")
+    started = time.perf_counter()
+    rows = result_rows(result.date, result.home_id, result.away_id, result.home.model_dump(), result.away.model_dump(),
+                       result.round, result.season)
+    try:
+        store_result(db_path, rows)
+    except ValueError as e:
+        RESULTS.inc("unknown_team")
+        raise HTTPException(status_code=404, detail=str(e))
+
+    with _reload_lock:
+        live_seq += 1
+        live_results.append((live_seq, rows))
+        current = apply_results(current, db_path, [rows])
+        res = current
+    if retrainer is not None:
+        retrainer.request()
+    RESULTS.inc("ok")
+    record("results", "ok", started)
+
+    teams = [result.home_id, result.away_id]
+    return {
+        "stored": len(rows),
+        "features": res.data_fp,
+        "stats": {str(t): res.team_stats(r) if r >= 0 else None for t, r in zip(teams, res.team_rows(teams))},
+        "pending_results": res.live_results,
+        "retrain_in": RETRAIN_DELAY if retrainer is not None else None
+    }
+
+@app.get("/results/status")
+def results_status():
+    res = current
+    return {"pending_results": res.live_results, "features": res.data_fp, "model": res.model_fp,
+            "retrain": retrainer.stats() if retrainer is not None else None}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    CACHE_ENTRIES.set(prediction_cache.stats()["size"])
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ratings")
+def team_ratings():
+    # Served from the version in memory, as of the last match train_rolling.py processed
+    res = current
+    if res.ratings is None:
+        raise HTTPException(status_code=404, detail="No team ratings yet. Run train_rolling.py first.")
+    return res.ratings_table(team_names(db_path))
+
+@app.get("/matrix")
+def predict_matrix():
+    started = time.perf_counter()
+    # Cached on the version object, so it's computed once per model/feature version
+    result = current.matchup_matrix(team_names(db_path))
+    record("matrix", "ok", started)
+    return result
+
+@app.post("/predict/batch")
+def predict_batch(batch: FixtureBatch):
+    started = time.perf_counter()
+    res = current
+    home_ids = [f.home_id for f in batch.fixtures]
+    away_ids = [f.away_id for f in batch.fixtures]
+    timings = {}
+    results = res.score_fixtures(home_ids, away_ids, include_stats=batch.include_stats, timings=timings)
+    response = serialize({
+        "results": [
+            {"home_id": h, "away_id": a, **r} for h, a, r in zip(home_ids, away_ids, results)
+        ]
+    }, timings)
+    missing = sum("error" in r for r in results)
+    BATCH_FIXTURES.inc("ok", amount=len(results) - missing)
+    BATCH_FIXTURES.inc("insufficient_data", amount=missing)
+    record("batch", "ok", started, timings, response)
+    return response
+
+@app.get("/simulate")
+def simulate_table(sims: int = Query(10_000, ge=1, le=1_000_000), seed: Optional[int] = None):
+    # Projected final table: title / top-four / relegation odds from Monte Carlo seasons
+    started = time.perf_counter()
+    res = current
+    season = load_season(db_path)
+    fixtures = season["fixtures"]
+    scored, ok = res.predict_probabilities(fixtures[:, 0], fixtures[:, 1])
+    table = simulate_season(fill_unknown(scored, ok), season, sims, seed)
+
+    names = team_names(db_path)
+    table.insert(1, "team", table["team_id"].map(names))
+    record("simulate", "ok", started)
+    return {
+        "season": season["season"],
+        "sims": sims,
+        "fixtures_remaining": len(fixtures),
+        "table": table.round(4).to_dict(orient="records")
+    }
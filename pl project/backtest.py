@@ -0,0 +1,143 @@
+import pandas as pd
+import numpy as np
+import argparse
+import time
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import log_loss, accuracy_score
+from train_rolling import data_path, store_path, predictors, model_predictors
+from features import feature_source, feature_columns, load_feature_frame
+
+# --- WALK-FORWARD BACKTEST ---
+# Steps through the feature store matchweek by matchweek: predict the coming week with a
+# model that has only seen earlier matches, then fold that week into the model and move on.
+# "extend" mode grows the forest with warm_start (a few new trees per step, oldest trees
+# dropped past a cap) instead of refitting all of it; "refit" is the naive loop to compare.
+
+CLASSES = [0, 1, 2] # Away win / draw / home win, as in train_rolling.add_targets
+SEED = 1
+
+
+# --- 1. FEATURE MATRIX (built once, sliced per step) ---
+def load_matrix(source=None, predictors=predictors):
+    """Feature store sorted by date, as arrays: every step's training set is then a prefix."""
+    # The typed store when there is one (see features.py), only the columns the walk needs
+    source = source or feature_source(store_path, data_path)
+    available = feature_columns(source)
+    if "round" not in available: # A store written before it held the rounds
+        source, available = data_path, feature_columns(data_path)
+    used = [p for p in predictors if p in available] # Feature files from before the ratings lack those columns
+    df = load_feature_frame(source, ["date", "season", "round", "target"] + used)
+    df = df.sort_values("date", kind="mergesort").reset_index(drop=True)
+    if len(used) < len(predictors):
+        print(f"⚠️ Feature store has no {sorted(set(predictors) - set(used))}, backtesting without them")
+    X = np.ascontiguousarray(df[used].to_numpy(dtype=np.float32))
+    y = df["target"].to_numpy()
+    return df, X, y
+
+
+def matchweek_steps(df):
+    """(start row, end row, season, round) per matchweek, in date order.
+
+    A step starts at the first match of a round; a postponed game is scored in whichever
+    step its actual date falls, so the model never sees a match before it's predicted.
+    """
+    firsts = df.groupby(["season", "round"], sort=False, observed=True)["date"].min().sort_values()
+    starts = np.unique(np.searchsorted(df["date"].to_numpy(), firsts.to_numpy()))
+    labels = dict(zip(np.searchsorted(df["date"].to_numpy(), firsts.to_numpy()), firsts.index))
+    ends = np.append(starts[1:], len(df))
+    return [(s, e, *labels[s]) for s, e in zip(starts, ends)]
+
+
+# --- 2. MODEL UPDATES ---
+def new_model(n_estimators, n_jobs):
+    # Same settings as the production model in train_rolling.py
+    return RandomForestClassifier(n_estimators=n_estimators, min_samples_split=10,
+                                  random_state=SEED, n_jobs=n_jobs, warm_start=True)
+
+
+def extend(rf, X, y, trees, max_trees, step):
+    """Adds `trees` trees fitted on everything seen so far; past max_trees the oldest go."""
+    # A fresh seed per step, otherwise every step's new trees would reuse the same seeds
+    rf.set_params(n_estimators=len(rf.estimators_) + trees, random_state=SEED + step)
+    rf.fit(X, y)
+    if len(rf.estimators_) > max_trees:
+        rf.estimators_ = rf.estimators_[-max_trees:]
+        rf.n_estimators = max_trees
+    return rf
+
+
+# --- 3. THE WALK ---
+def run_backtest(df, X, y, mode="extend", min_train=200, trees=10, max_trees=100, n_jobs=-1):
+    steps = [s for s in matchweek_steps(df) if s[0] >= min_train]
+    records, probs = [], np.empty((len(df), len(CLASSES)))
+    rf = None
+
+    for i, (start, end, season, round_name) in enumerate(steps):
+        t0 = time.perf_counter()
+        if mode == "refit" or rf is None:
+            # First step (or naive mode): a full forest on the whole prefix
+            rf = new_model(max_trees, n_jobs).fit(X[:start], y[:start])
+        else:
+            # Everything before this step, the last step's matches included
+            rf = extend(rf, X[:start], y[:start], trees, max_trees, i)
+        fit_secs = time.perf_counter() - t0
+
+        p = rf.predict_proba(X[start:end])
+        probs[start:end] = p
+        records.append({
+            "step": i, "season": int(season), "round": round_name,
+            "date": df["date"].iloc[start].strftime("%Y-%m-%d"),
+            "train_rows": int(start), "test_rows": int(end - start), "trees": len(rf.estimators_),
+            "accuracy": accuracy_score(y[start:end], np.asarray(CLASSES)[p.argmax(axis=1)]),
+            "log_loss": log_loss(y[start:end], p, labels=CLASSES),
+            "fit_secs": fit_secs, "step_secs": time.perf_counter() - t0
+        })
+
+    scored = slice(steps[0][0], len(df)) if steps else slice(0, 0)
+    return pd.DataFrame(records), probs[scored], y[scored], df["season"].to_numpy()[scored]
+
+
+def season_report(probs, y, seasons):
+    rows = []
+    for season in np.unique(seasons):
+        m = seasons == season
+        rows.append({
+            "season": int(season), "matches": int(m.sum()),
+            "log_loss": log_loss(y[m], probs[m], labels=CLASSES),
+            "accuracy": accuracy_score(y[m], np.asarray(CLASSES)[probs[m].argmax(axis=1)])
+        })
+    rows.append({
+        "season": "all", "matches": len(y),
+        "log_loss": log_loss(y, probs, labels=CLASSES),
+        "accuracy": accuracy_score(y, np.asarray(CLASSES)[probs.argmax(axis=1)])
+    })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward, matchweek-by-matchweek backtest of the RF model.")
+    parser.add_argument("--mode", choices=["extend", "refit"], default="extend",
+                        help="extend: add trees with warm_start each step; refit: new forest each step")
+    parser.add_argument("--trees", type=int, default=10, help="trees added per step in extend mode")
+    parser.add_argument("--max-trees", type=int, default=100, help="forest size cap (and size of a refit)")
+    parser.add_argument("--min-train", type=int, default=200, help="rows of history before the first scored step")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--head-to-head", action="store_true", help="include the (opt-in) head-to-head features")
+    parser.add_argument("--out", default=None, help="write the per-step results to this CSV")
+    args = parser.parse_args()
+
+    print("🏁 Starting Walk-Forward Backtest...")
+    df, X, y = load_matrix(predictors=model_predictors(args.head_to_head))
+    start = time.perf_counter()
+    steps, probs, y_scored, seasons = run_backtest(df, X, y, args.mode, args.min_train, args.trees, args.max_trees, args.n_jobs)
+    elapsed = time.perf_counter() - start
+
+    pd.set_option("display.width", 120)
+    print(f"📅 {len(steps)} matchweeks scored ({len(y_scored)} rows), {args.mode} mode")
+    print(season_report(probs, y_scored, seasons).round(4).to_string(index=False))
+    print(f"⏱️ Per step: fit {steps['fit_secs'].mean():.3f}s avg / {steps['fit_secs'].max():.3f}s max, "
+          f"total {steps['step_secs'].mean():.3f}s avg")
+    if args.out:
+        steps.to_csv(args.out, index=False)
+        print(f"💾 Per-step results saved to {args.out}")
+    print(f"✅ Backtest finished in {elapsed:.1f}s")
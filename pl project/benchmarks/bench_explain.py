@@ -0,0 +1,56 @@
+import pandas as pd
+import numpy as np
+import joblib
+import argparse
+import os
+import sys
+import time
+import warnings
+
+# TreeSHAP attributions (explain.py) for the trained forest: building the leaf tables,
+# one row on its own (an /explain cache miss) and batches (the pairings train_rolling.py
+# explains after training). Also checks base + contributions == predict_proba.
+# Run from anywhere: python benchmarks/bench_explain.py
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from packed_forest import PackedForest
+from explain import TreeExplainer
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--rows", type=int, default=380, help="batch size, default one season's pairings")
+parser.add_argument("--repeats", type=int, default=20, help="single-row runs")
+args = parser.parse_args()
+
+rf = joblib.load(os.path.join(BASE_DIR, "models", "rolling_rf_model.joblib"))
+rolling_data = pd.read_csv(os.path.join(BASE_DIR, "database", "rolling_data.csv"))
+X_all = rolling_data[list(rf.feature_names_in_)].to_numpy(dtype=np.float64)
+X = X_all[np.random.default_rng(0).integers(0, len(X_all), args.rows)]
+
+explainer = TreeExplainer(lambda: PackedForest.from_sklearn(rf))
+start = time.perf_counter()
+explainer.ensure_built()
+build_s = time.perf_counter() - start
+leaves = sum(len(g["node"]) for g in explainer.groups)
+slots = sum(g["z"].size for g in explainer.groups)
+
+single = []
+for row in X[:args.repeats]:
+    start = time.perf_counter()
+    explainer.shap_values(row[None])
+    single.append(time.perf_counter() - start)
+
+start = time.perf_counter()
+values = explainer.shap_values(X)
+batch_s = time.perf_counter() - start
+error = np.abs(explainer.expected_value + values.sum(axis=2) - rf.predict_proba(X)).max()
+
+print(pd.DataFrame([{
+    "trees": len(rf.estimators_), "features": X.shape[1], "leaves": leaves, "mean_path_features": round(slots / leaves, 2),
+    "build_s": round(build_s, 3), "single_p50_ms": round(np.median(single) * 1e3, 2),
+    f"batch_{args.rows}_s": round(batch_s, 2), "ms_per_row": round(batch_s / args.rows * 1e3, 2)
+}]).to_string(index=False))
+print(f"✅ Contributions add up to predict_proba (max error {error:.1e})" if error < 1e-9
+      else f"❌ Contributions off from predict_proba by {error:.1e}")
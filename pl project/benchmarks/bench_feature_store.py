@@ -0,0 +1,96 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Cold start on rolling_data.csv vs the typed store (rolling_data.npy): feature load +
+# team index, and a full Predictor (model included), each in a fresh interpreter so
+# nothing is warm. Larger scales tile the real feature file with shifted team ids.
+# Run from anywhere: python benchmarks/bench_feature_store.py --scales 1 10 100
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+data_path = os.path.join(BASE_DIR, "database", "rolling_data.csv")
+model_path = os.path.join(BASE_DIR, "models", "rolling_rf_model.joblib")
+
+
+def child(kind, path):
+    # Runs in the fresh interpreter: imports first, so only the load itself is measured
+    import warnings
+    warnings.filterwarnings("ignore")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from predictor import Predictor, build_team_index, cols
+    from features import load_feature_frame
+    from bench_pipeline import measure
+
+    if kind == "features":
+        _, stats = measure(lambda: build_team_index(load_feature_frame(path, ["home_team_id"] + cols)))
+    else:
+        _, stats = measure(lambda: Predictor(model_path, path, packed_path=None))
+    print(json.dumps(stats))
+
+
+def cold_runs(kind, path, repeats):
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", kind, path],
+                             capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    return min(runs, key=lambda r: r["seconds"])
+
+
+def tiled_features(scale):
+    # `scale` copies of the real file, each with its own team ids, rows kept in team order
+    df = pd.read_csv(data_path)
+    if scale == 1:
+        return df
+    step = int(max(df["home_team_id"].max(), df["away_team_id"].max())) + 1
+    return pd.concat([df.assign(home_team_id=df["home_team_id"] + k * step,
+                                away_team_id=df["away_team_id"] + k * step) for k in range(scale)],
+                     ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeats", type=int, default=3, help="fresh processes per measurement (best is kept)")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        sys.exit(0)
+
+    from features import save_feature_store
+    rows = []
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in args.scales:
+            df = tiled_features(scale)
+            paths = {"csv": os.path.join(folder, f"rolling_{scale}.csv"), "npy": os.path.join(folder, f"rolling_{scale}.npy")}
+            df.to_csv(paths["csv"], index=False)
+            save_feature_store(df, paths["npy"])
+
+            for fmt, path in paths.items():
+                feats = cold_runs("features", path, args.repeats)
+                full = cold_runs("predictor", path, args.repeats)
+                rows.append({"scale": f"{scale}x", "rows": len(df), "format": fmt,
+                             "file_mb": round(os.path.getsize(path) / 1e6, 2),
+                             "features_s": feats["seconds"], "features_growth_mb": feats["growth_mb"],
+                             "startup_s": full["seconds"], "startup_growth_mb": full["growth_mb"]})
+            print(f"⏱️ Scale {scale}x done ({len(df):,} rows)")
+
+    table = pd.DataFrame(rows)
+    print(table.to_string(index=False))
+
+    # Store vs CSV per scale
+    wide = table.pivot(index="scale", columns="format", values=["features_s", "startup_s", "startup_growth_mb"])
+    summary = pd.DataFrame({
+        "features_speedup": (wide["features_s"]["csv"] / wide["features_s"]["npy"]).round(1),
+        "startup_speedup": (wide["startup_s"]["csv"] / wide["startup_s"]["npy"]).round(2),
+        "memory_saved_mb": (wide["startup_growth_mb"]["csv"] - wide["startup_growth_mb"]["npy"]).round(1)
+    }).loc[[f"{s}x" for s in args.scales]]
+    print(summary.to_string())
@@ -0,0 +1,52 @@
+import pandas as pd
+import numpy as np
+import joblib
+import argparse
+import os
+import sys
+import time
+import warnings
+
+# Packed forest evaluator vs sklearn predict_proba, batch sizes 1 to 10k.
+# Also checks that both give exactly the same probabilities.
+# Run from anywhere: python benchmarks/bench_forest.py
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from packed_forest import PackedForest
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1_000, 10_000])
+parser.add_argument("--repeats", type=int, default=20)
+args = parser.parse_args()
+
+rf = joblib.load(os.path.join(BASE_DIR, "models", "rolling_rf_model.joblib"))
+packed = PackedForest.from_sklearn(rf)
+rolling_data = pd.read_csv(os.path.join(BASE_DIR, "database", "rolling_data.csv"))
+X_all = rolling_data[list(rf.feature_names_in_)].to_numpy(dtype=np.float64)
+rng = np.random.default_rng(0)
+
+
+def best_of(fn, X, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+rows = []
+for n in args.sizes:
+    X = X_all[rng.integers(0, len(X_all), n)]
+    exact = np.array_equal(rf.predict_proba(X), packed.predict_proba(X))
+    repeats = max(3, args.repeats // max(1, n // 1_000))
+    sk = best_of(rf.predict_proba, X, repeats)
+    pk = best_of(packed.predict_proba, X, repeats)
+    rows.append({"batch": n, "sklearn_ms": round(sk * 1e3, 3), "packed_ms": round(pk * 1e3, 3),
+                 "speedup": round(sk / pk, 2), "exact": exact})
+
+print(f"⏱️ {len(rf.estimators_)} trees, {len(packed.feature):,} nodes")
+print(pd.DataFrame(rows).to_string(index=False))
@@ -0,0 +1,68 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+# Head-to-head index (head_to_head.py) over synthetic history: the full grouped build
+# (should grow linearly with matches), saving it to SQLite, extending it by one matchweek,
+# and the API's in-memory lookup for a micro-batch of pairings.
+# Scale 1 is ~2 seasons of one league; scale 10 is ~20 league-seasons, 100 ~200.
+# Run from anywhere: python benchmarks/bench_head_to_head.py --scales 1 10 100
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from head_to_head import build_head_to_head, save_head_to_head, extend_head_to_head, current_head_to_head, pair_keys
+from predictor import build_pair_index
+from synthetic import generate_matches
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+parser.add_argument("--repeats", type=int, default=3)
+parser.add_argument("--batch", type=int, default=64, help="pairings per lookup, like one micro-batch")
+args = parser.parse_args()
+
+rows = []
+for scale in args.scales:
+    df = generate_matches(scale, seed=0)
+    # Ids the way db_setup.py would hand them out
+    codes, _ = pd.factorize(pd.concat([df["team"], df["opponent"]]))
+    matches = pd.DataFrame({"date": pd.to_datetime(df["date"]), "venue": df["venue"],
+                            "home_team_id": codes[:len(df)], "away_team_id": codes[len(df):],
+                            "gf": df["gf"], "ga": df["ga"], "xg": df["xg"], "xga": df["xga"]})
+    last_week = matches["date"] > matches["date"].max() - pd.Timedelta(days=7)
+
+    full = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        build_head_to_head(matches)
+        full.append(time.perf_counter() - start)
+
+    conn = sqlite3.connect(":memory:")
+    h2h = build_head_to_head(matches[~last_week])
+    start = time.perf_counter()
+    save_head_to_head(conn, h2h)
+    save_s = time.perf_counter() - start
+    start = time.perf_counter()
+    extend_head_to_head(conn, matches[last_week])
+    extend_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index, values = build_pair_index(current_head_to_head(conn))
+    load_s = time.perf_counter() - start
+    rng = np.random.default_rng(0)
+    teams = rng.integers(0, codes.max() + 1, (1000, 2, args.batch))
+    start = time.perf_counter()
+    for home, away in teams:
+        values[np.maximum(index.get_indexer(pair_keys(home, away)), 0)]
+    lookup_us = (time.perf_counter() - start) / len(teams) * 1e6
+
+    rows.append({"scale": f"{scale}x", "match_rows": len(matches), "full_s": round(min(full), 4),
+                 "us_per_row": round(min(full) / len(matches) * 1e6, 2), "save_s": round(save_s, 3),
+                 "last_week_rows": int(last_week.sum()), "extend_ms": round(extend_s * 1e3, 2),
+                 "pairs": len(index), "api_load_s": round(load_s, 3), f"lookup_{args.batch}_us": round(lookup_us, 1)})
+
+print(pd.DataFrame(rows).to_string(index=False))
@@ -0,0 +1,69 @@
+import pandas as pd
+import argparse
+import contextlib
+import io
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+# Scaling of train_rolling.py --jobs from 1 to N cores on synthetic data: the sharded
+# feature build, the forest fit and the per-season models (--split-by season).
+# Every run is checked against jobs=1: same feature frame, byte-identical pickled forest.
+# Run from anywhere: python benchmarks/bench_parallel.py --scale 10 --jobs 1 2 4 8
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "database"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import train_rolling
+from db_setup import setup_normalized_db
+from synthetic import generate_matches
+
+
+def timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the parallel training mode against the serial one.")
+    parser.add_argument("--scale", type=int, default=10, help="multiple of the real CSV's size")
+    parser.add_argument("--jobs", type=int, nargs="+", default=None, help="core counts to try (default 1..all)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    job_counts = sorted(set([1] + (args.jobs or list(range(1, cores + 1)))))
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_file = os.path.join(folder, "matches.csv")
+        db_file = os.path.join(folder, "premier_league.db")
+        generate_matches(args.scale, args.seed).to_csv(csv_file, index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup_normalized_db(csv_file, db_file, rebuild=True)
+        matches = train_rolling.load_matches(db_path=db_file)
+        train_rolling.split_dir = os.path.join(folder, "split")
+        print(f"⏱️ {len(matches):,} rows, {cores} cores available")
+
+        rows, serial = [], None
+        for jobs in job_counts:
+            features, feature_s = timed(lambda: train_rolling.build_features(matches, jobs=jobs))
+            rf, fit_s = timed(lambda: train_rolling.train_model(features, jobs))
+            with contextlib.redirect_stdout(io.StringIO()):
+                paths, split_s = timed(lambda: train_rolling.train_split_models(features, "season", jobs, workers=jobs))
+            split_models = [open(p, "rb").read() for p in sorted(paths)]
+            forest = pickle.dumps(rf)
+            if serial is None:
+                serial = features, forest, split_models, feature_s + fit_s + split_s
+            rows.append({"jobs": jobs, "features_s": round(feature_s, 3), "fit_s": round(fit_s, 3),
+                         "split_fit_s": round(split_s, 3),
+                         "speedup": round(serial[3] / (feature_s + fit_s + split_s), 2),
+                         "identical": features.equals(serial[0]) and forest == serial[1] and split_models == serial[2]})
+            print(f"⏱️ jobs={jobs}: features {feature_s:.2f}s, fit {fit_s:.2f}s, per-season {split_s:.2f}s")
+
+    print(pd.DataFrame(rows).to_string(index=False))
+    if jobs > cores:
+        print(f"⚠️ Only {cores} cores here, runs above that can't scale")
+    print("✅ Identical to jobs=1" if all(r["identical"] for r in rows) else "❌ Results differ from jobs=1")
@@ -0,0 +1,228 @@
+import pandas as pd
+import numpy as np
+import joblib
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+# End-to-end timings on synthetic data at 1x / 10x / 100x / 1000x the real CSV:
+# db_setup ingestion, feature build, RF fit, API startup and /predict latency,
+# with peak resident memory per stage. Results go to a JSON file named after the
+# commit, and --compare prints the change against an earlier results file.
+# Run from anywhere: python benchmarks/bench_pipeline.py --scales 1 10
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "database"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import predictor
+import sklearn
+from db_setup import setup_normalized_db
+from train_rolling import load_matches, build_features, train_model, write_head_to_head
+from head_to_head import build_head_to_head, save_head_to_head
+from packed_forest import PackedForest
+from cache import file_fingerprint
+from features import save_feature_store
+from ratings import Ratings
+from synthetic import generate_matches
+from fastapi.testclient import TestClient
+
+results_dir = os.path.join(BASE_DIR, "benchmarks", "results")
+
+
+def current_rss():
+    # Resident memory of this process in bytes (psutil if it's there, else Linux /proc)
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def measure(fn, interval=0.005):
+    """(result, {"seconds", "peak_mb", "growth_mb"}) for one call.
+
+    Memory is the process RSS sampled from a side thread (tracemalloc would slow the
+    timed code down several times and misses most allocations made in C).
+    """
+    before = current_rss()
+    peak = [before or 0]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], current_rss() or 0)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    out = fn()
+    seconds = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    peak[0] = max(peak[0], current_rss() or 0)
+
+    stats = {"seconds": round(seconds, 4), "peak_mb": None, "growth_mb": None}
+    if before is not None:
+        stats.update(peak_mb=round(peak[0] / 1e6, 1), growth_mb=round((peak[0] - before) / 1e6, 1))
+    return out, stats
+
+
+def quiet(fn):
+    # db_setup and the API print progress we don't want between the results
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return run
+
+
+def save_artifacts(rf, matches_rolling, ratings, h2h, folder, db_file):
+    paths = {name: os.path.join(folder, name) for name in ["model.joblib", "rolling_data.csv", "rolling_data.npy", "ratings.npz", "packed"]}
+    write_head_to_head(lambda conn: save_head_to_head(conn, h2h), db_file)
+    joblib.dump(rf, paths["model.joblib"])
+    ratings.save(paths["ratings.npz"])
+    matches_rolling.to_csv(paths["rolling_data.csv"], index=False)
+    save_feature_store(matches_rolling, paths["rolling_data.npy"])
+    PackedForest.from_sklearn(rf, file_fingerprint(paths["model.joblib"])).save(paths["packed"])
+    return paths
+
+
+def start_api(paths, db_file):
+    # Point the shared paths at this run's files, then import api/main.py fresh
+    predictor.model_path = paths["model.joblib"]
+    predictor.data_path = paths["rolling_data.csv"]
+    predictor.store_path = paths["rolling_data.npy"]
+    predictor.ratings_path = paths["ratings.npz"]
+    predictor.packed_path = paths["packed"]
+    predictor.db_path = db_file
+    predictor.explain_path = os.path.join(os.path.dirname(db_file), "explain.npz") # None saved: explained on request
+    spec = importlib.util.spec_from_file_location("bench_api_main", os.path.join(BASE_DIR, "api", "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def predict_latency(client, team_ids, n_requests, rng):
+    # Distinct random pairings, so every request misses the prediction cache
+    pairs = set()
+    while len(pairs) < min(n_requests, len(team_ids) * (len(team_ids) - 1)):
+        h, a = rng.choice(team_ids, 2, replace=False)
+        pairs.add((int(h), int(a)))
+    times = []
+    for h, a in pairs:
+        start = time.perf_counter()
+        client.get(f"/predict/{h}/{a}")
+        times.append(time.perf_counter() - start)
+    ms = np.array(times) * 1000
+    return {"requests": len(ms), "mean_ms": round(ms.mean(), 3), "p50_ms": round(np.percentile(ms, 50), 3),
+            "p95_ms": round(np.percentile(ms, 95), 3), "p99_ms": round(np.percentile(ms, 99), 3)}
+
+
+def bench_scale(scale, n_requests, seed):
+    stages = {}
+    with tempfile.TemporaryDirectory() as folder:
+        csv_file = os.path.join(folder, "matches.csv")
+        db_file = os.path.join(folder, "premier_league.db")
+
+        df, stages["generate"] = measure(lambda: generate_matches(scale, seed))
+        df.to_csv(csv_file, index=False)
+        rows, teams = len(df), df["team"].nunique()
+        del df
+
+        _, stages["ingest"] = measure(quiet(lambda: setup_normalized_db(csv_file, db_file, rebuild=True)))
+        matches, stages["load"] = measure(lambda: load_matches(db_path=db_file))
+        ratings = Ratings()
+        h2h = build_head_to_head(matches) # Built inside build_features in train_rolling.py, kept here to save it
+        matches_rolling, stages["features"] = measure(lambda: build_features(matches, ratings, h2h=h2h))
+        rf, stages["fit"] = measure(lambda: train_model(matches_rolling))
+        paths, stages["save"] = measure(lambda: save_artifacts(rf, matches_rolling, ratings, h2h, folder, db_file))
+        team_ids = matches_rolling["home_team_id"].unique()
+        del matches, matches_rolling, rf, h2h
+
+        api, stages["api_startup"] = measure(quiet(lambda: start_api(paths, db_file)))
+        client = TestClient(api.app)
+        client.get("/") # Warm the client itself before timing requests
+        latency, stages["predict"] = measure(lambda: predict_latency(client, team_ids, n_requests, np.random.default_rng(seed)))
+        stages["predict"].update(latency)
+
+    return {"rows": rows, "teams": int(teams), "stages": stages}
+
+
+def git_commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip())
+        return sha, dirty
+    except Exception:
+        return "unknown", None
+
+
+def compare(old, new):
+    rows = []
+    for scale, run in new["scales"].items():
+        before = old["scales"].get(scale)
+        if not before:
+            continue
+        for stage, m in run["stages"].items():
+            if stage in before["stages"]:
+                was = before["stages"][stage]["seconds"]
+                rows.append({"scale": f"{scale}x", "stage": stage, "old_s": was, "new_s": m["seconds"],
+                             "change": f"{(m['seconds'] / was - 1) * 100:+.0f}%" if was else "n/a"})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the training and serving pipeline on synthetic data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="multiples of the real CSV's size (add 1000 for the full sweep, needs ~10 GB RAM)")
+    parser.add_argument("--requests", type=int, default=200, help="/predict calls per scale")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="results JSON (default: benchmarks/results/pipeline_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    # Import-time costs shouldn't land in the first scale's API startup
+    os.environ["PL_RELOAD_INTERVAL"] = "0"
+    import fastapi, simulate, cache # noqa: F401
+
+    sha, dirty = git_commit()
+    results = {
+        "commit": sha, "dirty": dirty, "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(), "cpu_count": os.cpu_count(), "python": platform.python_version(),
+        "numpy": np.__version__, "pandas": pd.__version__, "sklearn": sklearn.__version__,
+        "scales": {}
+    }
+
+    for scale in args.scales:
+        print(f"⏱️ Scale {scale}x...")
+        run = bench_scale(scale, args.requests, args.seed)
+        results["scales"][str(scale)] = run
+        table = pd.DataFrame(run["stages"]).T[["seconds", "peak_mb", "growth_mb"]]
+        print(f"   {run['rows']:,} rows, {run['teams']:,} teams, /predict p50 {run['stages']['predict']['p50_ms']}ms "
+              f"p95 {run['stages']['predict']['p95_ms']}ms")
+        print(table.to_string())
+
+    out = args.out or os.path.join(results_dir, f"pipeline_{sha}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), results).to_string(index=False))
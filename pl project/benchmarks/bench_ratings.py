@@ -0,0 +1,50 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import sys
+import time
+
+# Full rating recompute (ratings.py) over synthetic history, plus the cost of one
+# incremental matchweek on top of the finished state.
+# Scale 1 is ~2 seasons of one league; scale 10 is ~20 league-seasons, 100 ~200.
+# Run from anywhere: python benchmarks/bench_ratings.py --scales 1 10 100
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ratings import Ratings
+from synthetic import generate_matches
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+parser.add_argument("--repeats", type=int, default=3)
+args = parser.parse_args()
+
+rows = []
+for scale in args.scales:
+    df = generate_matches(scale, seed=0)
+    # Ids the way db_setup.py would hand them out
+    codes, _ = pd.factorize(pd.concat([df["team"], df["opponent"]]))
+    matches = pd.DataFrame({"date": pd.to_datetime(df["date"]), "venue": df["venue"],
+                            "home_team_id": codes[:len(df)], "away_team_id": codes[len(df):],
+                            "gf": df["gf"], "ga": df["ga"], "xg": df["xg"], "xga": df["xga"]})
+    last_week = matches["date"] > matches["date"].max() - pd.Timedelta(days=7)
+
+    full = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        Ratings().process(matches)
+        full.append(time.perf_counter() - start)
+
+    ratings = Ratings()
+    ratings.process(matches[~last_week])
+    start = time.perf_counter()
+    ratings.process(matches[last_week])
+    incremental = time.perf_counter() - start
+
+    rows.append({"scale": f"{scale}x", "fixtures": len(matches) // 2, "teams": int(codes.max()) + 1,
+                 "full_s": round(min(full), 4), "us_per_fixture": round(min(full) / (len(matches) / 2) * 1e6, 2),
+                 "last_week_fixtures": int(last_week.sum()) // 2, "incremental_ms": round(incremental * 1e3, 2)})
+
+print(pd.DataFrame(rows).to_string(index=False))
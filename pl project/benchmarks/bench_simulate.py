@@ -0,0 +1,37 @@
+import pandas as pd
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+# Runtime and peak memory of the season simulator vs number of simulated seasons.
+# Run from anywhere: python benchmarks/bench_simulate.py
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from simulate import db_path, load_season, fill_unknown, simulate_season
+from predictor import Predictor
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--sims", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+parser.add_argument("--workers", type=int, default=1)
+args = parser.parse_args()
+
+season = load_season(db_path)
+fixtures = season["fixtures"]
+probs = fill_unknown(*Predictor().predict_probabilities(fixtures[:, 0], fixtures[:, 1]))
+print(f"⏱️ {len(season['fixtures'])} fixtures, {len(season['team_ids'])} teams, workers={args.workers}")
+
+rows = []
+for n in args.sims:
+    tracemalloc.start()
+    start = time.perf_counter()
+    simulate_season(probs, season, n, seed=0, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows.append({"sims": n, "seconds": round(elapsed, 3), "sims_per_sec": int(n / elapsed),
+                 "peak_mb": round(peak / 1e6, 1)})
+
+print(pd.DataFrame(rows).to_string(index=False))
@@ -0,0 +1,120 @@
+import pandas as pd
+import numpy as np
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import json
+import time
+import httpx
+
+# /predict under concurrent load, with and without micro-batching: throughput and
+# latency per concurrency level, each mode in its own uvicorn process (cache off, so
+# every request is scored). Also checks both modes return the same predictions.
+# Run from anywhere: python benchmarks/load_test.py --concurrency 1 50 500
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from predictor import current_features
+from features import load_feature_frame
+
+
+def start_server(port, microbatch):
+    env = {**os.environ, "PL_MICROBATCH": "1" if microbatch else "0", "PL_CACHE_SIZE": "0",
+           "PL_RELOAD_INTERVAL": "0", "PYTHONWARNINGS": "ignore"}
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                               "--log-level", "warning", "--no-access-log", "--backlog", "4096",
+                               "--timeout-keep-alive", "120"],
+                              cwd=os.path.join(BASE_DIR, "api"), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(600):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("API didn't come up")
+
+
+async def get(reader, writer, path):
+    # Bare HTTP/1.1 keep-alive GET: an httpx pool with hundreds of connections
+    # costs more CPU than the server does, and this box runs both
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = int(next(line.split(b":")[1] for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")))
+    return status, await reader.readexactly(length)
+
+
+async def run_load(port, pairs, concurrency):
+    """Fires every pair with `concurrency` requests in flight. Returns (seconds, latencies, responses, errors)."""
+    latencies, responses, errors = [], {}, [0]
+    queue = iter(pairs)
+
+    async def worker():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            for h, a in queue:
+                start = time.perf_counter()
+                try:
+                    status, body = await get(reader, writer, f"/predict/{h}/{a}")
+                except (OSError, asyncio.IncompleteReadError):
+                    errors[0] += 1
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                    continue
+                if status != 200:
+                    errors[0] += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+                responses[(h, a)] = json.loads(body)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - start, np.array(latencies) * 1000, responses, errors[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--requests", type=int, default=3000, help="requests per concurrency level (sequential level: 200)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    team_ids = np.unique(load_feature_frame(current_features(), ["home_team_id"])["home_team_id"])
+    rng = np.random.default_rng(0)
+
+    rows, answers = [], {}
+    for microbatch in [False, True]:
+        mode = "microbatch" if microbatch else "per-request"
+        server = start_server(args.port, microbatch)
+        try:
+            for c in args.concurrency:
+                n = 200 if c == 1 else args.requests
+                pairs = [tuple(int(t) for t in rng.choice(team_ids, 2, replace=False)) for _ in range(n)]
+                asyncio.run(run_load(args.port, pairs[:min(50, n)], min(c, 50))) # Warm up connections + threads
+                seconds, ms, responses, errors = asyncio.run(run_load(args.port, pairs, c))
+                answers.setdefault(mode, {}).update(responses)
+                rows.append({"mode": mode, "concurrency": c, "requests": n, "errors": errors,
+                             "req_per_s": round((n - errors) / seconds, 1),
+                             "p50_ms": round(np.percentile(ms, 50), 2), "p95_ms": round(np.percentile(ms, 95), 2),
+                             "p99_ms": round(np.percentile(ms, 99), 2)})
+                print(f"⏱️ {mode}, {c} concurrent: {(n - errors) / seconds:,.0f} req/s, p50 {np.percentile(ms, 50):.2f}ms")
+        finally:
+            server.terminate()
+            server.wait()
+
+    table = pd.DataFrame(rows)
+    print(table.to_string(index=False))
+    wide = table.pivot(index="concurrency", columns="mode", values=["req_per_s", "p50_ms"])
+    print(pd.DataFrame({
+        "throughput_x": (wide["req_per_s"]["microbatch"] / wide["req_per_s"]["per-request"]).round(2),
+        "p50_change_ms": (wide["p50_ms"]["microbatch"] - wide["p50_ms"]["per-request"]).round(2)
+    }).to_string())
+
+    common = answers["per-request"].keys() & answers["microbatch"].keys()
+    same = all(answers["per-request"][k] == answers["microbatch"][k] for k in common)
+    print(f"{'✅' if same else '❌'} Same predictions in both modes ({len(common)} pairings compared)")
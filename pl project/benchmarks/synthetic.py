@@ -0,0 +1,89 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+
+# Seeded synthetic matches in the same schema as data/premier_league_matches_2022-2025.csv.
+# Scale 1 is one 20-team league over the same span as the real file (~1.6k rows);
+# scale N is N such leagues side by side, so N x the rows, teams and history.
+# Run from anywhere: python benchmarks/synthetic.py --scale 10 --out matches_10x.csv
+
+COLUMNS = ["date", "time", "comp", "round", "day", "venue", "result", "gf", "ga", "opponent",
+           "xg", "xga", "poss", "attendance", "captain", "formation", "opp formation", "referee",
+           "match report", "notes", "sh", "sot", "dist", "fk", "pk", "pkatt", "season", "team"]
+TEAMS = 20
+SEASONS = [(2023, 38), (2024, 38), (2025, 6)] # (season, matchweeks played): 1,640 rows per league
+REFEREES = 30
+FORMATIONS = ["4-2-3-1", "4-3-3", "3-4-3", "4-4-2", "3-5-2", "4-1-4-1", "5-3-2"]
+
+
+def round_robin(n=TEAMS):
+    """Double round robin (circle method): list of matchweeks, each an array of (home, away)."""
+    teams = list(range(n))
+    weeks = []
+    for _ in range(n - 1):
+        pairs = [(teams[i], teams[n - 1 - i]) for i in range(n // 2)]
+        weeks.append(np.array(pairs))
+        teams = [teams[0]] + [teams[-1]] + teams[1:-1]
+    return weeks + [w[:, ::-1] for w in weeks]
+
+
+def team_rows(rng, home, away, dates, season, round_names, league):
+    """Both perspectives of every fixture, home rows first, as a DataFrame in CSV layout."""
+    n = len(home)
+    xg_h, xg_a = rng.gamma(4.0, 0.38, n), rng.gamma(4.0, 0.30, n)
+    gf_h, gf_a = rng.poisson(xg_h), rng.poisson(xg_a)
+    poss_h = np.clip(rng.normal(50, 10, n), 25, 75).round()
+    sh_h, sh_a = rng.poisson(13, n), rng.poisson(11, n)
+    name = np.char.add(f"L{league:04d} Team ", np.char.zfill(np.arange(TEAMS).astype(str), 2))
+    ref = np.char.add("Referee ", np.char.zfill(rng.integers(1, REFEREES + 1, n).astype(str), 2))
+
+    def side(team, opp, gf, ga, xg, xga, poss, sh, venue):
+        pk = rng.binomial(1, 0.1, n)
+        return pd.DataFrame({
+            "date": dates.strftime("%Y-%m-%d"), "time": "15:00", "comp": "Premier League",
+            "round": round_names, "day": dates.strftime("%a"), "venue": venue,
+            "result": np.where(gf > ga, "W", np.where(gf < ga, "L", "D")),
+            "gf": gf.astype(float), "ga": ga.astype(float), "opponent": name[opp],
+            "xg": xg.round(1), "xga": xga.round(1), "poss": poss,
+            "attendance": rng.normal(40_000, 12_000, n).clip(10_000).round(),
+            "captain": np.char.add("Captain ", name[team]), "formation": rng.choice(FORMATIONS, n),
+            "opp formation": rng.choice(FORMATIONS, n), "referee": ref,
+            "match report": "Match Report", "notes": np.nan,
+            "sh": sh.astype(float), "sot": rng.binomial(sh, 0.35).astype(float),
+            "dist": rng.normal(17, 2.5, n).round(1), "fk": rng.poisson(0.4, n).astype(float),
+            "pk": pk, "pkatt": pk, "season": season, "team": name[team]
+        })
+
+    return pd.concat([
+        side(home, away, gf_h, gf_a, xg_h, xg_a, poss_h, sh_h, "Home"),
+        side(away, home, gf_a, gf_h, xg_a, xg_h, 100 - poss_h, sh_a, "Away")
+    ])
+
+
+def generate_matches(scale=1, seed=0):
+    rng = np.random.default_rng(seed)
+    weeks = round_robin()
+    frames = []
+    for league in range(scale):
+        for season, played in SEASONS:
+            fixtures = np.concatenate(weeks[:played])
+            week_no = np.repeat(np.arange(played), TEAMS // 2)
+            # Saturdays from mid-August, a few games pushed to Sunday/Monday
+            start = pd.Timestamp(f"{season}-08-16") + pd.offsets.Week(weekday=5)
+            dates = pd.DatetimeIndex(start + pd.to_timedelta(week_no * 7 + rng.choice([0, 0, 1, 2], len(week_no)), unit="D"))
+            round_names = np.char.add("Matchweek ", (week_no + 1).astype(str))
+            frames.append(team_rows(rng, fixtures[:, 0], fixtures[:, 1], dates, season, round_names, league))
+    return pd.concat(frames, ignore_index=True)[COLUMNS]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic match CSV in the real file's schema.")
+    parser.add_argument("--scale", type=int, default=1, help="1 = the size of the real CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    df = generate_matches(args.scale, args.seed)
+    df.to_csv(args.out, index=False)
+    print(f"✅ Wrote {len(df):,} rows ({df['team'].nunique()} teams) to {os.path.abspath(args.out)}")
@@ -1,60 +1,235 @@
-import pandas as pd
-import sqlite3
-import os
-
-# --- Configuration ---
-# Your absolute path to the data
-csv_path = r'C:\Users\sujal\Downloads\pl project\data\premier_league_matches_2022-2025.csv'
-db_path = 'premier_league.db' # This creates it inside the database folder
-
-def setup_normalized_db():
-    if not os.path.exists(csv_path):
-        print(f"Error: CSV not found at {csv_path}")
-        return
-    
-    df = pd.read_csv(csv_path)
-
-    # 1. Data Cleaning (Requirement #1 & Task 4)
-    # Drop empty/useless columns identified during EDA
-    df_clean = df.drop(columns=['notes', 'match report'], errors='ignore')
-
-    # 2. Normalization (3NF - Task 1)
-    # Create Table: Teams
-    all_teams = sorted(pd.concat([df_clean['team'], df_clean['opponent']]).unique())
-    teams_df = pd.DataFrame({'team_id': range(1, len(all_teams) + 1), 'team_name': all_teams})
-    
-    # Create Table: Referees
-    all_refs = sorted(df_clean['referee'].dropna().unique())
-    referees_df = pd.DataFrame({'referee_id': range(1, len(all_refs) + 1), 'referee_name': all_refs})
-    
-    # Map text names to IDs for the final Matches table
-    df_norm = df_clean.merge(teams_df, left_on='team', right_on='team_name').rename(columns={'team_id': 'home_team_id'})
-    df_norm = df_norm.merge(teams_df, left_on='opponent', right_on='team_name').rename(columns={'team_id': 'away_team_id'})
-    df_norm = df_norm.merge(referees_df, left_on='referee', right_on='referee_name', how='left').rename(columns={'referee_id': 'ref_id'})
-    
-    # Drop original text columns to strictly adhere to 3NF
-    matches_table = df_norm.drop(columns=['team', 'opponent', 'referee', 'team_name_x', 'team_name_y', 'referee_name'])
-    
-    # 3. Save to SQLite
-    if os.path.exists(db_path):
-        os.remove(db_path)
-    conn = sqlite3.connect(db_path)
-    teams_df.to_sql('teams', conn, index=False, if_exists='replace')
-    referees_df.to_sql('referees', conn, index=False, if_exists='replace')
-    matches_table.to_sql('matches', conn, index=False, if_exists='replace')
-    
-    # 4. Verification: SQL JOIN statement (Task 2 Requirement)
-    check = pd.read_sql("""
-        SELECT m.date, t1.team_name as Home, t2.team_name as Away, m.result
-        FROM matches m
-        JOIN teams t1 ON m.home_team_id = t1.team_id
-        JOIN teams t2 ON m.away_team_id = t2.team_id
-        LIMIT 5
-    """, conn)
-    conn.close()
-    
-    print("✅ Database created and 3NF Normalization complete.")
-    print(check)
-
-if __name__ == "__main__":
-    setup_normalized_db()
\ No newline at end of file
+import pandas as pd
+import sqlite3
+import argparse
+import os
+
+# --- Configuration ---
+# Paths are relative to the project folder, so this runs from anywhere
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+csv_path = os.path.join(BASE_DIR, "data", "premier_league_matches_2022-2025.csv")
+db_path = os.path.join(BASE_DIR, "database", "premier_league.db")
+STATE_FILE = "rolling_state.csv" # train_rolling.py's incremental state, next to the database
+CHUNK_SIZE = 5000 # CSV rows per batch, memory stays flat however many seasons the file holds
+
+# Matches table columns, in the same order the original to_sql build created them
+MATCH_COLUMNS = {
+    "date": "TEXT", "time": "TEXT", "comp": "TEXT", "round": "TEXT", "day": "TEXT",
+    "venue": "TEXT", "result": "TEXT", "gf": "REAL", "ga": "REAL", "xg": "REAL",
+    "xga": "REAL", "poss": "REAL", "attendance": "REAL", "captain": "TEXT",
+    "formation": "TEXT", "opp formation": "TEXT", "sh": "REAL", "sot": "REAL",
+    "dist": "REAL", "fk": "REAL", "pk": "INTEGER", "pkatt": "INTEGER", "season": "INTEGER",
+    "home_team_id": "INTEGER", "away_team_id": "INTEGER", "ref_id": "INTEGER"
+}
+MATCH_KEY = ["date", "home_team_id", "away_team_id"] # One row per (date, team, opponent)
+
+# Seed for the team_aliases table (Alias -> Canonical Name). The CSV spells some clubs
+# differently in the team and opponent columns; rows added to the table by hand are kept.
+TEAM_ALIASES = {
+    "Man Utd": "Manchester United",
+    "Manchester Utd": "Manchester United",
+    "Man City": "Manchester City",
+    "Spurs": "Tottenham Hotspur",
+    "Tottenham": "Tottenham Hotspur",
+    "West Ham": "West Ham United",
+    "Newcastle": "Newcastle United",
+    "Newcastle Utd": "Newcastle United",
+    "Brighton & Hove Albion": "Brighton",
+    "Brighton and Hove Albion": "Brighton",
+    "Nott'm Forest": "Nottingham Forest",
+    "Nott'ham Forest": "Nottingham Forest",
+    "Wolves": "Wolverhampton Wanderers",
+    "Sheffield Utd": "Sheffield United",
+    "Leeds": "Leeds United",
+    "Leicester": "Leicester City"
+}
+
+
+# --- 1. SCHEMA ---
+def create_schema(conn):
+    # One statement at a time: executescript() would commit our open transaction
+    columns = ", ".join(f'"{c}" {t}' for c, t in MATCH_COLUMNS.items())
+    for sql in [
+        "CREATE TABLE IF NOT EXISTS teams (team_id INTEGER, team_name TEXT)",
+        "CREATE TABLE IF NOT EXISTS referees (referee_id INTEGER, referee_name TEXT)",
+        "CREATE TABLE IF NOT EXISTS team_aliases (alias TEXT PRIMARY KEY, team_name TEXT NOT NULL)",
+        f"CREATE TABLE IF NOT EXISTS matches ({columns})",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_teams_name ON teams(team_name)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_referees_name ON referees(referee_name)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_matches_key ON matches(date, home_team_id, away_team_id)",
+        # Team history lookups (training, rolling features, API) scan by team then date
+        "CREATE INDEX IF NOT EXISTS idx_matches_team_date ON matches(home_team_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_matches_opponent_date ON matches(away_team_id, date)",
+    ]:
+        conn.execute(sql)
+
+
+# --- 2. TEAM ALIASES ---
+def seed_aliases(conn):
+    """Writes TEAM_ALIASES into the table and returns every alias it holds."""
+    conn.executemany(
+        "INSERT INTO team_aliases (alias, team_name) VALUES (?, ?) "
+        "ON CONFLICT(alias) DO UPDATE SET team_name = excluded.team_name",
+        TEAM_ALIASES.items()
+    )
+    return dict(conn.execute("SELECT alias, team_name FROM team_aliases").fetchall())
+
+
+def merge_aliases(conn):
+    """Backfill: folds teams stored under an alias into the canonical team. Returns teams merged."""
+    # An alias with no canonical row yet is simply renamed (one per club), keeping its id
+    conn.execute("""
+        UPDATE teams SET team_name = a.team_name
+        FROM team_aliases a
+        WHERE teams.team_name = a.alias
+          AND NOT EXISTS (SELECT 1 FROM teams t WHERE t.team_name = a.team_name)
+          AND teams.team_id = (
+              SELECT MIN(t.team_id) FROM teams t JOIN team_aliases b ON b.alias = t.team_name
+              WHERE b.team_name = a.team_name
+          )
+    """)
+
+    # Every other alias id is rewritten to the canonical id in one statement per column
+    conn.execute("DROP TABLE IF EXISTS temp.alias_ids")
+    conn.execute("""
+        CREATE TEMP TABLE alias_ids AS
+        SELECT bad.team_id AS bad_id, good.team_id AS good_id
+        FROM teams bad
+        JOIN team_aliases a ON a.alias = bad.team_name
+        JOIN teams good ON good.team_name = a.team_name
+    """)
+    conn.execute("UPDATE matches SET home_team_id = m.good_id FROM alias_ids m WHERE matches.home_team_id = m.bad_id")
+    conn.execute("UPDATE matches SET away_team_id = m.good_id FROM alias_ids m WHERE matches.away_team_id = m.bad_id")
+    merged = conn.execute("DELETE FROM teams WHERE team_id IN (SELECT bad_id FROM alias_ids)").rowcount
+    conn.execute("DROP TABLE temp.alias_ids")
+    return merged
+
+
+# --- 3. ID LOOKUPS ---
+def assign_team_ids(conn, known, names, aliases):
+    """Adds unseen teams to `known` ({canonical name: team_id}) and the teams table."""
+    new = sorted(n for n in set(names) if aliases.get(n, n) not in known)
+    next_id = max(known.values(), default=0) + 1
+    added = []
+    # Numbered in name order like the original build, aliases included, so the
+    # ids don't depend on chunking and only canonical names are ever stored
+    for team_id, name in enumerate(new, start=next_id):
+        canonical = aliases.get(name, name)
+        if canonical in known:
+            continue # Another alias of the same club, already added under its canonical name
+        if name == canonical or canonical not in new:
+            known[canonical] = team_id
+            added.append((team_id, canonical))
+    conn.executemany("INSERT INTO teams (team_id, team_name) VALUES (?, ?)", added)
+    return len(added)
+
+
+def assign_referee_ids(conn, known, names):
+    new = sorted(set(names) - set(known))
+    next_id = max(known.values(), default=0) + 1
+    added = list(zip(range(next_id, next_id + len(new)), new))
+    known.update({name: ref_id for ref_id, name in added})
+    conn.executemany("INSERT INTO referees (referee_id, referee_name) VALUES (?, ?)", added)
+    return len(added)
+
+
+# --- 4. UPSERT ---
+def upsert_matches(conn, chunk):
+    """Inserts new matches and updates changed ones. Returns rows written (unchanged ones aren't)."""
+    columns = list(MATCH_COLUMNS)
+    names = ", ".join(f'"{c}"' for c in columns)
+    values = [c for c in columns if c not in MATCH_KEY]
+    updates = ", ".join(f'"{c}" = excluded."{c}"' for c in values)
+    # IS NOT treats two NULLs as equal, so a re-run of the same file rewrites nothing
+    changed = " OR ".join(f'excluded."{c}" IS NOT matches."{c}"' for c in values)
+    sql = (
+        f"INSERT INTO matches ({names}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT({', '.join(MATCH_KEY)}) DO UPDATE SET {updates} WHERE {changed}"
+    )
+    # NaN -> NULL, and plain Python values for sqlite3
+    rows = chunk[columns].astype(object).where(chunk[columns].notna(), None)
+    return conn.executemany(sql, rows.itertuples(index=False, name=None)).rowcount
+
+
+def setup_normalized_db(csv_path=csv_path, db_path=db_path, chunk_size=CHUNK_SIZE, rebuild=False):
+    if not os.path.exists(csv_path):
+        print(f"Error: CSV not found at {csv_path}")
+        return
+
+    # isolation_level=None: we open and close the one transaction ourselves
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    # WAL: the API and training keep reading the old data while a load is running
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if rebuild:
+            for table in ["matches", "teams", "referees"]:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+        create_schema(conn)
+        aliases = seed_aliases(conn)
+        merged = merge_aliases(conn)
+        before = conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        teams = dict(conn.execute("SELECT team_name, team_id FROM teams").fetchall())
+        referees = dict(conn.execute("SELECT referee_name, referee_id FROM referees").fetchall())
+
+        # Pass 1 (name columns only): give every unseen team/referee its id up front,
+        # so the numbering doesn't depend on where the chunk boundaries fall
+        team_names, ref_names = set(), set()
+        for chunk in pd.read_csv(csv_path, usecols=['team', 'opponent', 'referee'], chunksize=chunk_size):
+            team_names.update(chunk['team'], chunk['opponent'])
+            ref_names.update(chunk['referee'].dropna())
+        new_teams = assign_team_ids(conn, teams, team_names, aliases)
+        new_refs = assign_referee_ids(conn, referees, ref_names)
+
+        # Pass 2: upsert the matches chunk by chunk
+        processed = written = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+            # 1. Data Cleaning (Requirement #1 & Task 4)
+            # Drop empty/useless columns identified during EDA
+            chunk = chunk.drop(columns=['notes', 'match report'], errors='ignore')
+
+            # 2. Normalization (3NF - Task 1): text names -> ids
+            chunk['home_team_id'] = chunk['team'].replace(aliases).map(teams)
+            chunk['away_team_id'] = chunk['opponent'].replace(aliases).map(teams)
+            chunk['ref_id'] = chunk['referee'].map(referees)
+
+            written += upsert_matches(conn, chunk)
+            processed += len(chunk)
+
+        after = conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        conn.close()
+        raise
+
+    # The features, ratings and head-to-head built so far are keyed by the old ids: without
+    # the state the next train_rolling.py --incremental does a full rebuild instead
+    state_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), STATE_FILE)
+    if merged and os.path.exists(state_path):
+        os.remove(state_path)
+        print("🧹 Team ids merged, removed the incremental state: the next training run rebuilds everything.")
+
+    # 4. Verification: SQL JOIN statement (Task 2 Requirement)
+    check = pd.read_sql("""
+        SELECT m.date, t1.team_name as Home, t2.team_name as Away, m.result
+        FROM matches m
+        JOIN teams t1 ON m.home_team_id = t1.team_id
+        JOIN teams t2 ON m.away_team_id = t2.team_id
+        LIMIT 5
+    """, conn)
+    conn.close()
+
+    new = after - before
+    print(f"✅ Ingested {processed} rows: {new} new matches, {written - new} updated, {processed - written} unchanged.")
+    print(f"👥 {new_teams} new teams, {new_refs} new referees, {merged} duplicate teams merged.")
+    print(check)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the match CSV into SQLite (upserts, safe to re-run).")
+    parser.add_argument("--csv", default=csv_path, help="match CSV to ingest")
+    parser.add_argument("--db", default=db_path)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--rebuild", action="store_true", help="drop and recreate the tables (one transaction, readers never see it empty)")
+    args = parser.parse_args()
+    setup_normalized_db(args.csv, args.db, args.chunk_size, args.rebuild)
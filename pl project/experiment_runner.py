@@ -1,106 +1,320 @@
-import pandas as pd
-import mlflow
-import mlflow.sklearn
-import dagshub
-import optuna
-import os
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.metrics import f1_score
-from xgboost import XGBClassifier
-from lightgbm import LGBMClassifier
-
-# --- 1. DAGSHUB CONFIG ---
-# Replace with your actual username and repo name from Dagshub
-USERNAME = "YOUR_DAGSHUB_USERNAME"
-REPO_NAME = "YOUR_REPO_NAME"
-
-dagshub.init(repo_name=REPO_NAME, repo_owner=USERNAME, mlflow=True)
-mlflow.set_experiment("PL_16_Experiments")
-
-# --- 2. DATA PREP ---
-df = pd.read_csv("database/rolling_data.csv")
-features = ["gf_rolling", "ga_rolling", "xg_rolling", "xga_rolling", 
-            "poss_rolling", "sh_rolling", "sot_rolling", "dist_rolling", "venue_code"]
-X = df[features]
-y = df["target"]
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-# --- 3. HYPERPARAMETER TUNING (OPTUNA) ---
-def get_best_params(model_name, xt, yt):
-    def objective(trial):
-        if model_name == "RF":
-            params = {"n_estimators": trial.suggest_int("n_estimators", 50, 200), "max_depth": trial.suggest_int("max_depth", 5, 20)}
-            m = RandomForestClassifier(**params)
-        elif model_name == "XGB":
-            params = {"n_estimators": trial.suggest_int("n_estimators", 50, 200), "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.2)}
-            m = XGBClassifier(**params)
-        elif model_name == "LGBM":
-            params = {"n_estimators": trial.suggest_int("n_estimators", 50, 200), "num_leaves": trial.suggest_int("num_leaves", 20, 50)}
-            m = LGBMClassifier(**params, verbose=-1)
-        else:
-            params = {"C": trial.suggest_float("C", 0.1, 10.0)}
-            m = LogisticRegression(**params)
-            
-        m.fit(xt, yt)
-        return f1_score(y_test, m.predict(pca_transform(X_test_scaled, xt.shape[1])), average='weighted')
-
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=5)
-    return study.best_params
-
-def pca_transform(data, n_cols):
-    if n_cols < 9: # If PCA was applied
-        pca_temp = PCA(n_components=n_cols)
-        pca_temp.fit(X_train_scaled)
-        return pca_temp.transform(data)
-    return data
-
-# --- 4. THE 16 EXPERIMENT LOOP ---
-model_classes = {"RF": RandomForestClassifier, "XGB": XGBClassifier, "LGBM": LGBMClassifier, "LogReg": LogisticRegression}
-
-print("🧪 Starting 16 Experiments...")
-
-for m_name, m_class in model_classes.items():
-    for use_pca in [False, True]:
-        for use_tune in [False, True]:
-            run_name = f"{m_name}_PCA:{use_pca}_Tuned:{use_tune}"
-            
-            with mlflow.start_run(run_name=run_name):
-                # Apply PCA Condition
-                xt = X_train_scaled
-                xe = X_test_scaled
-                if use_pca:
-                    pca = PCA(n_components=5)
-                    xt = pca.fit_transform(xt)
-                    xe = pca.transform(xe)
-                
-                # Apply Tuning Condition
-                params = {}
-                if use_tune:
-                    params = get_best_params(m_name, xt, y_train)
-                    mlflow.log_params(params)
-                
-                # Train Final Model for this Run
-                model = m_class(**params)
-                model.fit(xt, y_train)
-                
-                # Log Metrics
-                preds = model.predict(xe)
-                f1 = f1_score(y_test, preds, average='weighted')
-                mlflow.log_metric("f1_score", f1)
-                mlflow.log_param("pca_used", use_pca)
-                mlflow.log_param("tuning_used", use_tune)
-                
-                # Save the model to Dagshub
-                mlflow.sklearn.log_model(model, "model")
-                print(f"✅ Finished {run_name} | F1: {f1:.4f}")
-
-print("🚀 All experiments are now live on Dagshub!")
\ No newline at end of file
+import pandas as pd
+import numpy as np
+import mlflow
+import mlflow.sklearn
+import optuna
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib.metadata import version
+from pathlib import Path
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.decomposition import PCA
+from sklearn.metrics import f1_score
+from xgboost import XGBClassifier
+from lightgbm import LGBMClassifier
+from xgboost.callback import TrainingCallback
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
+from cache import file_fingerprint
+from features import load_feature_frame, feature_source
+from schema import memory_report
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+data_path = os.path.join(BASE_DIR, "database", "rolling_data.csv")
+store_path = os.path.join(BASE_DIR, "database", "rolling_data.npy") # Typed copy written by train_rolling.py
+matrix_dir = os.path.join(BASE_DIR, "database", "experiment_cache") # Prepared matrices, one folder per data version
+local_store = os.path.join(BASE_DIR, "mlruns") # MLflow file store used when Dagshub isn't available
+
+# --- 1. DAGSHUB CONFIG ---
+# Replace with your actual username and repo name from Dagshub
+USERNAME = "YOUR_DAGSHUB_USERNAME"
+REPO_NAME = "YOUR_REPO_NAME"
+EXPERIMENT = "PL_16_Experiments"
+
+
+def init_tracking(offline=False):
+    """Dagshub when it's configured and reachable, otherwise the local MLflow file store."""
+    if not offline and USERNAME != "YOUR_DAGSHUB_USERNAME":
+        try:
+            import dagshub
+            dagshub.init(repo_name=REPO_NAME, repo_owner=USERNAME, mlflow=True)
+            mlflow.set_experiment(EXPERIMENT)
+            return mlflow.get_tracking_uri()
+        except Exception as e:
+            print(f"⚠️ Dagshub unavailable ({e}), logging locally instead")
+    mlflow.set_tracking_uri(Path(local_store).as_uri())
+    mlflow.set_experiment(EXPERIMENT)
+    return mlflow.get_tracking_uri()
+
+
+# --- 2. DATA PREP (once, shared by every grid cell) ---
+features = ["gf_rolling", "ga_rolling", "xg_rolling", "xga_rolling",
+            "poss_rolling", "sh_rolling", "sot_rolling", "dist_rolling", "venue_code"]
+PCA_COMPONENTS = 5
+SEED = 42 # Fixed so a run gives the same metrics however many workers it's split across
+MATRICES = ["X_train", "X_test", "X_train_pca", "X_test_pca", "y_train", "y_test"]
+
+
+def prepare_matrices(source=None):
+    """Scaled and PCA-projected train/test matrices as .npy files, reused until the data changes."""
+    source = source or feature_source(store_path, data_path)
+    out = os.path.join(matrix_dir, file_fingerprint(source))
+    if os.path.exists(out):
+        return out
+
+    df = load_feature_frame(source, features + ["target"])
+    memory_report("experiment data", df)
+    X = df[features]
+    y = df["target"]
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    # One PCA fit for the whole grid (it used to be refitted inside every tuning trial)
+    pca = PCA(n_components=PCA_COMPONENTS)
+
+    arrays = {
+        "X_train": X_train_scaled,
+        "X_test": X_test_scaled,
+        "X_train_pca": pca.fit_transform(X_train_scaled),
+        "X_test_pca": pca.transform(X_test_scaled),
+        "y_train": y_train.to_numpy(),
+        "y_test": y_test.to_numpy()
+    }
+    tmp = f"{out}.{os.getpid()}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(arr))
+    if os.path.exists(out): # Another runner got there first
+        shutil.rmtree(tmp)
+    else:
+        os.replace(tmp, out)
+    return out
+
+
+def load_matrices(path, use_pca):
+    # Memory-mapped, so all workers share the same pages instead of each holding a copy
+    m = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in MATRICES}
+    if use_pca:
+        return m["X_train_pca"], m["X_test_pca"], m["y_train"], m["y_test"]
+    return m["X_train"], m["X_test"], m["y_train"], m["y_test"]
+
+
+# --- 3. HYPERPARAMETER TUNING (OPTUNA) ---
+# Studies live in SQLite, so an interrupted run resumes where it stopped and any number
+# of processes (this script run several times, or its pool workers) can share a study.
+storage_url = "sqlite:///" + os.path.join(BASE_DIR, "database", "optuna.db")
+REPORT_EVERY = 25 # Trees / boosting rounds between intermediate scores
+pruners = {
+    "median": lambda: optuna.pruners.MedianPruner(n_startup_trials=5),
+    "halving": lambda: optuna.pruners.SuccessiveHalvingPruner()
+}
+model_classes = {"RF": RandomForestClassifier, "XGB": XGBClassifier, "LGBM": LGBMClassifier, "LogReg": LogisticRegression}
+
+
+def make_model(model_name, params, threads=1, **extra):
+    # threads: cores per grid cell, so parallel cells don't oversubscribe the CPU
+    if model_name == "LGBM":
+        extra["verbose"] = -1
+    return model_classes[model_name](**params, **extra, random_state=SEED, n_jobs=threads)
+
+
+def model_requirements(model_name):
+    # Pinned up front: letting MLflow infer them costs several seconds per logged model
+    reqs = mlflow.sklearn.get_default_pip_requirements()
+    package = {"XGB": "xgboost", "LGBM": "lightgbm"}.get(model_name)
+    if package:
+        reqs.append(f"{package}=={version(package)}")
+    return reqs
+
+
+def suggest_params(trial, model_name):
+    if model_name == "RF":
+        return {"n_estimators": trial.suggest_int("n_estimators", 50, 200), "max_depth": trial.suggest_int("max_depth", 5, 20)}
+    elif model_name == "XGB":
+        return {"n_estimators": trial.suggest_int("n_estimators", 50, 200), "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.2)}
+    elif model_name == "LGBM":
+        return {"n_estimators": trial.suggest_int("n_estimators", 50, 200), "num_leaves": trial.suggest_int("num_leaves", 20, 50)}
+    return {"C": trial.suggest_float("C", 0.1, 10.0)}
+
+
+def check_prune(trial, step, proba, ye):
+    # Targets are 0/1/2, so the argmax column is the predicted class
+    trial.report(f1_score(ye, proba.argmax(axis=1), average='weighted'), step)
+    if trial.should_prune():
+        raise optuna.TrialPruned()
+
+
+class XGBPruning(TrainingCallback):
+    def __init__(self, trial, xe, ye):
+        super().__init__()
+        self.trial, self.xe, self.ye = trial, xe, ye
+
+    def after_iteration(self, model, epoch, evals_log):
+        rounds = epoch + 1
+        if rounds % REPORT_EVERY == 0:
+            check_prune(self.trial, rounds, model.inplace_predict(self.xe, iteration_range=(0, rounds)), self.ye)
+        return False
+
+
+def lgbm_pruning(trial, xe, ye):
+    def callback(env):
+        rounds = env.iteration + 1
+        if rounds % REPORT_EVERY == 0:
+            check_prune(trial, rounds, env.model.predict(xe, num_iteration=rounds), ye)
+    return callback
+
+
+def objective(trial, model_name, xt, yt, xe, ye, threads=1):
+    """Weighted F1 of one trial, reporting the score every REPORT_EVERY trees so bad trials stop early."""
+    params = suggest_params(trial, model_name)
+    xe = np.asarray(xe)
+    if model_name == "RF":
+        # Grown in batches with warm_start (same forest as one fit), scored after each batch
+        m = make_model(model_name, params, threads, warm_start=True)
+        for n in range(REPORT_EVERY, params["n_estimators"], REPORT_EVERY):
+            m.set_params(n_estimators=n).fit(xt, yt)
+            check_prune(trial, n, m.predict_proba(xe), ye)
+        m.set_params(n_estimators=params["n_estimators"]).fit(xt, yt)
+    elif model_name == "XGB":
+        m = make_model(model_name, params, threads, callbacks=[XGBPruning(trial, xe, ye)])
+        m.fit(xt, yt)
+    elif model_name == "LGBM":
+        m = make_model(model_name, params, threads)
+        m.fit(xt, yt, callbacks=[lgbm_pruning(trial, xe, ye)])
+    else:
+        m = make_model(model_name, params, threads)
+        m.fit(xt, yt)
+    return f1_score(ye, m.predict(xe), average='weighted')
+
+
+def study_name(model_name, use_pca, matrices):
+    # One study per model / PCA setting and data version, so a rerun resumes the right one
+    return f"{model_name}_PCA:{use_pca}_{os.path.basename(matrices)}"
+
+
+def open_study(name, pruner="median", seed=SEED):
+    storage = optuna.storages.RDBStorage(storage_url, engine_kwargs={"connect_args": {"timeout": 60}})
+    return optuna.create_study(
+        study_name=name, storage=storage, load_if_exists=True, direction="maximize",
+        sampler=optuna.samplers.TPESampler(seed=seed), pruner=pruners[pruner]()
+    )
+
+
+def finished_trials(study):
+    return len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED)))
+
+
+def tune_worker(model_name, use_pca, matrices, n_trials, pruner="median", worker=0, threads=1):
+    """Pulls trials from the stored study until it holds n_trials finished ones (earlier runs count)."""
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    xt, xe, y_train, y_test = load_matrices(matrices, use_pca)
+    name = study_name(model_name, use_pca, matrices)
+    # Each worker gets its own sampler seed, or they'd all start by suggesting the same params
+    study = open_study(name, pruner, SEED + worker)
+
+    remaining = n_trials - finished_trials(study)
+    if remaining > 0:
+        study.optimize(
+            lambda trial: objective(trial, model_name, xt, y_train, xe, y_test, threads),
+            n_trials=remaining,
+            callbacks=[MaxTrialsCallback(n_trials, states=(TrialState.COMPLETE, TrialState.PRUNED))]
+        )
+    return name
+
+
+# --- 4. ONE GRID CELL ---
+def run_cell(m_name, use_pca, use_tune, matrices, tracking_uri, threads=1):
+    run_name = f"{m_name}_PCA:{use_pca}_Tuned:{use_tune}"
+    xt, xe, y_train, y_test = load_matrices(matrices, use_pca)
+
+    # Worker processes don't inherit the parent's MLflow client state
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(EXPERIMENT)
+
+    start = time.perf_counter()
+    with mlflow.start_run(run_name=run_name):
+        # Apply Tuning Condition: best params from the stored study
+        params = {}
+        if use_tune:
+            study = optuna.load_study(study_name=study_name(m_name, use_pca, matrices), storage=storage_url)
+            params = study.best_params
+            mlflow.log_params(params)
+            mlflow.log_param("tuning_trials", finished_trials(study))
+
+        # Train Final Model for this Run
+        model = make_model(m_name, params, threads)
+        model.fit(xt, y_train)
+
+        # Log Metrics
+        preds = model.predict(xe)
+        f1 = f1_score(y_test, preds, average='weighted')
+        mlflow.log_metric("f1_score", f1)
+        mlflow.log_param("pca_used", use_pca)
+        mlflow.log_param("tuning_used", use_tune)
+
+        # Save the model to the tracking store
+        mlflow.sklearn.log_model(model, "model", pip_requirements=model_requirements(m_name))
+    return run_name, f1, time.perf_counter() - start
+
+
+def run_all(fn, tasks, workers):
+    """fn(*task) for every task, in a process pool when workers > 1; yields results as they finish."""
+    if workers == 1:
+        for task in tasks:
+            yield fn(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fn, *task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# --- 5. THE 16 EXPERIMENT GRID ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the 4 models x PCA x tuning experiment grid.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes to run trials / grid cells in")
+    parser.add_argument("--trials", type=int, default=50, help="finished Optuna trials per study (resumes towards this)")
+    parser.add_argument("--pruner", choices=list(pruners), default="median")
+    parser.add_argument("--tune-only", action="store_true", help="only run trials (start several of these to tune in parallel)")
+    parser.add_argument("--offline", action="store_true", help="skip Dagshub and log to the local mlruns/ store")
+    args = parser.parse_args()
+
+    matrices = prepare_matrices()
+    workers = max(1, args.workers)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    start = time.perf_counter()
+
+    # 1. Tuning: one study per model / PCA setting, each pulled from by several workers
+    studies = [(m, p) for m in model_classes for p in [False, True]]
+    per_study = max(1, workers // len(studies))
+    tasks = [(m, p, matrices, args.trials, args.pruner, w, threads) for w in range(per_study) for m, p in studies]
+    # Storage schema and studies are created here, once: pool workers creating them at
+    # the same time on a fresh optuna.db fail with "table studies already exists"
+    for m, p in studies:
+        open_study(study_name(m, p, matrices), args.pruner)
+    print(f"🎛️ Tuning {len(studies)} studies to {args.trials} trials each ({args.pruner} pruning)...")
+    for name in dict.fromkeys(run_all(tune_worker, tasks, min(workers, len(tasks)))):
+        study = optuna.load_study(study_name=name, storage=storage_url)
+        pruned = len(study.get_trials(deepcopy=False, states=(TrialState.PRUNED,)))
+        print(f"🎯 {name}: best F1 {study.best_value:.4f} ({finished_trials(study)} trials, {pruned} pruned)")
+    if args.tune_only:
+        raise SystemExit(0)
+
+    # 2. The grid itself
+    print("🧪 Starting 16 Experiments...")
+    tracking_uri = init_tracking(args.offline)
+    grid = [(m, p, t, matrices, tracking_uri, threads) for m in model_classes for p in [False, True] for t in [False, True]]
+    results = {}
+    for run_name, f1, secs in run_all(run_cell, grid, min(workers, len(grid))):
+        results[run_name] = f1
+        print(f"✅ Finished {run_name} | F1: {f1:.4f} ({secs:.1f}s)")
+
+    print(f"🚀 All {len(results)} experiments logged to {tracking_uri} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,172 @@
+import numpy as np
+import os
+import threading
+
+# --- TREESHAP ATTRIBUTIONS ---
+# Exact (path-dependent) TreeSHAP for the forest, from the packed arrays: how much each
+# model input pushed each class probability away from the forest's average output.
+# base + contributions add up to predict_proba, to float rounding.
+#
+# Every leaf is flattened once into the path conditions it sits behind, one slot per
+# feature on the path: the interval x must fall in (lo, hi] and the share of training
+# samples that went that way (z, node covers multiplied down the path). For one row a
+# slot is then "one" (x is inside) or not, and a leaf's Shapley values are an integral
+# of a product over its slots, done exactly by Gauss-Legendre quadrature. That turns the
+# usual recursive walk into a few array operations over every leaf of every tree.
+
+
+def leaf_paths(forest):
+    """(leaf node, slot feature, lo, hi, z) for every leaf, slots padded to the longest path.
+
+    Walks all trees a level at a time; padding slots are (-inf, inf] with z = 1, which
+    no row can fail, so they never get a share.
+    """
+    n_features = len(forest.feature_names_in_)
+    is_leaf = forest.children[:, 0] == np.arange(len(forest.children))
+    node = forest.roots.astype(np.int64)
+    lo = np.full((len(node), n_features), -np.inf)
+    hi = np.full((len(node), n_features), np.inf)
+    z = np.ones((len(node), n_features))
+    leaves = []
+    while len(node):
+        done = is_leaf[node]
+        leaves.append((node[done], lo[done], hi[done], z[done]))
+        node, lo, hi, z = node[~done], lo[~done], hi[~done], z[~done]
+        rows = np.arange(len(node))
+        f, t = forest.feature[node], forest.threshold[node]
+
+        left, right = forest.children[node, 0], forest.children[node, 1]
+        l_hi, r_lo = hi.copy(), lo.copy()
+        l_hi[rows, f] = np.minimum(hi[rows, f], t)
+        r_lo[rows, f] = np.maximum(lo[rows, f], t)
+        l_z, r_z = z.copy(), z.copy()
+        l_z[rows, f] *= forest.cover[left] / forest.cover[node]
+        r_z[rows, f] *= forest.cover[right] / forest.cover[node]
+        node = np.concatenate([left, right])
+        lo, hi, z = np.concatenate([lo, r_lo]), np.concatenate([l_hi, hi]), np.concatenate([l_z, r_z])
+
+    node, lo, hi, z = (np.concatenate(a) for a in zip(*leaves))
+    # Keep only the features each path actually splits on, left-aligned
+    on_path = np.isfinite(lo) | np.isfinite(hi)
+    width = max(int(on_path.sum(axis=1).max()), 1)
+    order = np.argsort(~on_path, axis=1, kind="stable")[:, :width]
+    kept = np.take_along_axis(on_path, order, axis=1)
+    pick = lambda a, pad: np.where(kept, np.take_along_axis(a, order, axis=1), pad)
+    return node, np.where(kept, order, 0), pick(lo, -np.inf), pick(hi, np.inf), pick(z, 1.0)
+
+
+def path_groups(node, feature, lo, hi, z):
+    """leaf_paths() split by number of features on the path, padding dropped.
+
+    Work per leaf grows with the square of its path width, so the many short paths
+    shouldn't pay for the few long ones. Arrays are slot-major, (slots, leaves).
+    """
+    widths = (np.isfinite(lo) | np.isfinite(hi)).sum(axis=1)
+    groups = []
+    for w in np.unique(widths):
+        leaves = np.flatnonzero(widths == w)
+        w = max(int(w), 1) # A tree that's a single leaf has no slots; give it one padding slot
+        g = {"node": node[leaves], **{k: np.ascontiguousarray(a[leaves, :w].T) for k, a in
+                                       [("feature", feature), ("lo", lo), ("hi", hi), ("z", z)]}}
+        # A leaf's product is a polynomial of degree < w, which this many nodes integrate exactly
+        x, weights = np.polynomial.legendre.leggauss((w + 1) // 2)
+        u = (x + 1) / 2
+        g["weights"] = weights / 2
+        # A slot's factor at node u: z (1 - u) + u when the row is inside it, z (1 - u) when not
+        g["inside"] = [g["z"] * (1 - v) + v for v in u]
+        g["outside"] = [g["z"] * (1 - v) for v in u]
+        groups.append(g)
+    return groups
+
+
+class TreeExplainer:
+    """TreeSHAP values for a PackedForest (exported with node covers).
+
+    load() returns the forest and is only called, once, on first use, so creating one
+    is free until something actually asks for an explanation.
+    """
+
+    def __init__(self, load, chunk=1):
+        self.load = load
+        self.chunk = chunk # Rows per pass; one at a time keeps the (rows x slots x leaves) temporaries in cache
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _build(self):
+        forest = self.load()
+        self.n_features = len(forest.feature_names_in_)
+        self.classes_ = forest.classes_
+        self.groups = path_groups(*leaf_paths(forest))
+        n_trees = len(forest.roots)
+        self.expected_value = np.zeros(len(self.classes_))
+        for g in self.groups:
+            # Each tree's output is a mean over trees, so fold the 1 / n_trees into the leaves
+            g["value"] = forest.proba[g["node"]] / n_trees
+            # Average output: every leaf weighted by the share of samples reaching it
+            self.expected_value += (g["z"].prod(axis=0)[:, None] * g["value"]).sum(axis=0)
+        self._ready = True
+
+    def ensure_built(self):
+        with self._lock:
+            if not self._ready:
+                self._build()
+
+    def shap_values(self, X):
+        """(n_rows, n_classes, n_features) contributions for the rows of X."""
+        self.ensure_built()
+        # Compared the way the forest compares them: float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        out = np.zeros((len(X), len(self.classes_), self.n_features))
+        for start in range(0, len(X), self.chunk):
+            rows = X[start:start + self.chunk]
+            for g in self.groups:
+                out[start:start + len(rows)] += self._group(rows, g)
+        return out
+
+    def _group(self, X, g):
+        n = len(X)
+        x = X[:, g["feature"]] # (rows, slots, leaves)
+        one = (x > g["lo"]) & (x <= g["hi"])
+        # Shapley weight of each slot, with the other slots' factors integrated over u
+        share = np.zeros(one.shape)
+        for w, inside, outside in zip(g["weights"], g["inside"], g["outside"]):
+            factor = np.where(one, inside, outside)
+            share += (w * factor.prod(axis=1, keepdims=True)) / factor
+        share *= one - g["z"]
+
+        # Scatter slots onto their features, one class at a time
+        index = (np.arange(n)[:, None, None] * self.n_features + g["feature"]).ravel()
+        out = np.empty((n, len(self.classes_), self.n_features))
+        for c in range(len(self.classes_)):
+            weights = (share * g["value"][:, c]).ravel()
+            out[:, c] = np.bincount(index, weights, minlength=n * self.n_features).reshape(n, self.n_features)
+        return out
+
+
+# --- PRECOMPUTED PAIRINGS ---
+# train_rolling.py explains this season's pairings right after training and saves them
+# next to the model, tagged with the model / feature fingerprints they were computed for.
+def current_pairings(conn):
+    """(home_id, away_id) for every two teams of the latest season that share a competition."""
+    return conn.execute("""
+        WITH teams AS (SELECT DISTINCT comp, home_team_id AS team FROM matches
+                       WHERE season = (SELECT MAX(season) FROM matches))
+        SELECT DISTINCT h.team, a.team FROM teams h JOIN teams a ON h.comp = a.comp AND h.team != a.team
+        ORDER BY 1, 2
+    """).fetchall()
+
+
+def save_explanations(path, home_ids, away_ids, values, base, model_fp, data_fp):
+    with open(path, "wb") as f:
+        np.savez(f, home=np.asarray(home_ids, dtype=np.int64), away=np.asarray(away_ids, dtype=np.int64),
+                 values=values, base=base, model_fp=model_fp, data_fp=data_fp)
+
+
+def load_explanations(path, model_fp, data_fp):
+    """The saved arrays as a dict, or None when missing or computed for another version."""
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path) as saved:
+        if str(saved["model_fp"]) != model_fp or str(saved["data_fp"]) != data_fp:
+            return None
+        return {k: saved[k] for k in ["home", "away", "values", "base"]}
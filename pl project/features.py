@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from ratings import RATING_FEATURES
+from head_to_head import H2H_FEATURES
+from schema import read_feature_csv
+
+# --- ROLLING FEATURE ENGINE ---
+# All rolling stats are computed in one grouped pass over the whole match table
+# (no per-team Python lambdas), so cost grows with row count only.
+
+COLS = ["gf", "ga", "xg", "xga", "poss", "sh", "sot", "dist"]
+
+# Integer windows are "last N games", "season" is season-to-date.
+WINDOWS = (3, 5, 10, "season")
+BASE_WINDOW = 3 # The window the model (and rolling_data.csv) has always used
+
+TEAM_COL = "home_team_id"
+
+
+def rolling_column_names(cols=COLS, window=BASE_WINDOW):
+    # Window 3 keeps the original "<col>_rolling" names so old files still line up
+    if window == BASE_WINDOW:
+        return [f"{c}_rolling" for c in cols]
+    if window == "season":
+        return [f"{c}_season" for c in cols]
+    return [f"{c}_rolling_{window}" for c in cols]
+
+
+def rolling_averages(df, cols=COLS, windows=WINDOWS, group_col=TEAM_COL):
+    """Adds closed='left' rolling means for every window, one row per match.
+
+    Rows come back ordered by team then date (same as the old groupby.apply
+    version) and rows without any history for the base window are dropped.
+    """
+    ordered = df.sort_values([group_col, "date"], kind="mergesort").copy()
+    grouped = ordered.groupby(group_col, sort=False)[cols]
+
+    for window in windows:
+        new_cols = rolling_column_names(cols, window)
+        if window == "season":
+            ordered[new_cols] = season_to_date(ordered, cols, group_col)
+            continue
+
+        # min_periods=1: a team with only 1 previous game still gets a value
+        stats = grouped.rolling(window, closed="left", min_periods=1).mean()
+        ordered[new_cols] = stats.droplevel(0).reindex(ordered.index).to_numpy()
+
+    # We remove rows ONLY if they are completely empty (no history at all)
+    ordered = ordered.dropna(subset=rolling_column_names(cols, BASE_WINDOW))
+    return ordered.reset_index(drop=True)
+
+
+def team_shards(df, n_shards, group_col=TEAM_COL):
+    """Splits df into up to n_shards frames of whole teams, roughly equal in rows.
+
+    Shards hold consecutive team ids, so their rolling_averages() results, concatenated
+    in shard order, come out in the same team/date order as one call over all of df.
+    """
+    ids, counts = np.unique(df[group_col].to_numpy(), return_counts=True)
+    cuts = np.searchsorted(np.cumsum(counts), np.arange(1, n_shards) * len(df) / n_shards)
+    bounds = np.unique(np.concatenate([[0], cuts, [len(ids)]]))
+    return [df[df[group_col].isin(ids[lo:hi])] for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+def sharded_rolling_averages(df, cols=COLS, windows=WINDOWS, jobs=1, group_col=TEAM_COL):
+    """rolling_averages() with teams split over a process pool; same rows, same values.
+
+    Every window is per team, so no shard needs another shard's rows.
+    """
+    shards = team_shards(df, jobs, group_col)
+    if len(shards) <= 1:
+        return rolling_averages(df, cols, windows, group_col)
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        parts = list(pool.map(rolling_averages, shards, repeat(cols), repeat(windows), repeat(group_col)))
+    return pd.concat(parts, ignore_index=True)
+
+
+def season_to_date(ordered, cols=COLS, group_col=TEAM_COL):
+    # Prefix sums per (team, season), shifted one game so the current match is excluded.
+    # NaNs are skipped the same way rolling().mean() skips them.
+    keys = [ordered[group_col], ordered["season"]]
+    values = ordered[cols]
+
+    sums = values.fillna(0.0).groupby(keys).cumsum()
+    counts = values.notna().astype(float).groupby(keys).cumsum()
+
+    prev_sums = sums.groupby(keys).shift(1)
+    prev_counts = counts.groupby(keys).shift(1)
+    return (prev_sums / prev_counts.where(prev_counts > 0)).to_numpy()
+
+
+# --- INCREMENTAL STATE ---
+# Just enough raw history per team to continue every window without the full table:
+# the last max(window) games plus every game of the team's latest season.
+
+def trailing_state(df, cols=COLS, windows=WINDOWS, group_col=TEAM_COL):
+    ordered = df.sort_values([group_col, "date"], kind="mergesort")
+    keep_last = max(w for w in windows if w != "season")
+
+    mask = ordered.groupby(group_col).cumcount(ascending=False) < keep_last
+    if "season" in windows:
+        latest_season = ordered.groupby(group_col)["season"].transform("max")
+        mask |= ordered["season"] == latest_season
+
+    return ordered.loc[mask, ["date", "season", group_col] + cols].reset_index(drop=True)
+
+
+def extend_rolling_averages(state, new_matches, cols=COLS, windows=WINDOWS, group_col=TEAM_COL):
+    """Feature rows for new_matches only, continuing from a trailing_state() frame.
+
+    Returns (new feature rows, updated state). The rows match what a full
+    rolling_averages() rebuild would produce for those matches.
+    """
+    combined = pd.concat(
+        [state.assign(_is_new=False), new_matches.assign(_is_new=True)], ignore_index=True
+    )
+    rolled = rolling_averages(combined, cols, windows, group_col)
+    new_rows = rolled[rolled["_is_new"]].drop(columns="_is_new")
+
+    return new_rows.reset_index(drop=True), trailing_state(combined, cols, windows, group_col)
+
+
+# --- TYPED FEATURE STORE ---
+# The columns serving, training and the backtest actually read from rolling_data.csv, saved
+# as one structured .npy: no text parsing on startup, small ints for ids and codes, and it
+# can be memory-mapped. Stats stay float64 so the API returns exactly what the CSV holds.
+
+STORE_COLUMNS = (["date", "season", "round", "home_team_id", "away_team_id"] + rolling_column_names() + RATING_FEATURES
+                 + H2H_FEATURES + ["venue_code", "target"])
+TEXT_COLUMNS = {"round"} # Fixed-width strings, "" for a missing value
+
+
+def small_int(values):
+    # Narrowest signed type holding every value (team ids outgrow int8 fast, int16 is plenty)
+    lo, hi = (int(values.min()), int(values.max())) if len(values) else (0, 0)
+    for t in (np.int8, np.int16, np.int32):
+        if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max:
+            return t
+    return np.int64
+
+
+def save_feature_store(matches_rolling, path):
+    floats = set(rolling_column_names() + RATING_FEATURES + H2H_FEATURES)
+    columns = [c for c in STORE_COLUMNS if c in matches_rolling] # Files from before the ratings have none
+    text = {c: matches_rolling[c].astype(object).fillna("").astype(str) for c in TEXT_COLUMNS if c in columns}
+    dtype = [(c, "datetime64[D]" if c == "date" else np.float64 if c in floats
+              else f"U{max(text[c].str.len().max(), 1)}" if c in text else small_int(matches_rolling[c]))
+             for c in columns]
+    store = np.empty(len(matches_rolling), dtype=dtype)
+    for c in columns:
+        values = pd.to_datetime(matches_rolling[c]) if c == "date" else text.get(c, matches_rolling[c])
+        store[c] = values.to_numpy()
+    with open(path, "wb") as f: # A file object, so np.save doesn't append .npy to a temp name
+        np.save(f, store)
+
+
+def load_feature_store(path, mmap=True):
+    """Structured array with one field per STORE_COLUMNS entry, rows in file order."""
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def feature_source(store_path, csv_path):
+    # The typed store once train_rolling.py has written one, otherwise the CSV
+    return store_path if os.path.exists(store_path) else csv_path
+
+
+def feature_columns(path):
+    """Columns a feature file of either format holds, without reading its rows."""
+    if path.endswith(".npy"):
+        return list(load_feature_store(path).dtype.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def store_column(store, c):
+    # Text comes back as a categorical with NaN for "", as read_feature_csv() gives it
+    if store.dtype[c].kind == "U":
+        return pd.Categorical(np.where(store[c] == "", None, store[c]))
+    return store[c]
+
+
+def load_feature_frame(path, columns=None):
+    """DataFrame from either format, limited to `columns` when given and typed by schema.py."""
+    if path.endswith(".npy"):
+        store = load_feature_store(path)
+        return pd.DataFrame({c: store_column(store, c) for c in columns or store.dtype.names})
+    return read_feature_csv(path, columns)
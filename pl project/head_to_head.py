@@ -0,0 +1,177 @@
+import pandas as pd
+import numpy as np
+from ratings import fixtures_from_matches
+
+# --- HEAD-TO-HEAD INDEX ---
+# How a team has done against one particular opponent over their last few meetings:
+# average points, goal difference and xG difference, from the team's side.
+# Built for every match in one grouped pass and kept in SQLite (head_to_head table),
+# one row per team per meeting. New meetings extend it one row at a time from the last
+# H2H_WINDOW rows of that pair, so neither --incremental nor POST /results rebuilds it.
+
+H2H_WINDOW = 5
+H2H_STATS = ["points", "gd", "xgd"] # This meeting, team's side
+H2H_FEATURES = ["h2h_games", "h2h_points", "h2h_gd", "h2h_xgd"] # Over the meetings before it
+
+# The primary key is the index every lookup goes through, and WITHOUT ROWID makes the
+# table that index: the last N meetings of a pair are one contiguous range read, stats included
+H2H_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS head_to_head (
+        home_team_id INTEGER NOT NULL, away_team_id INTEGER NOT NULL, date TEXT NOT NULL,
+        {", ".join(f"{c} REAL" for c in H2H_STATS + H2H_FEATURES)},
+        PRIMARY KEY (home_team_id, away_team_id, date)
+    ) WITHOUT ROWID
+"""
+
+
+def meeting_rows(matches):
+    """Both sides of every fixture with this meeting's points / gd / xgd, in date order."""
+    fx = fixtures_from_matches(matches)
+    hxg = fx["hxg"].fillna(fx["hg"]) # Goals stand in for a missing xG, as in ratings.py
+    axg = fx["axg"].fillna(fx["ag"])
+    points = np.where(fx["hg"] > fx["ag"], 3.0, np.where(fx["hg"] == fx["ag"], 1.0, 0.0))
+    home = pd.DataFrame({"date": fx["date"], "home_team_id": fx["home"], "away_team_id": fx["away"],
+                         "points": points, "gd": fx["hg"] - fx["ag"], "xgd": hxg - axg})
+    away = pd.DataFrame({"date": fx["date"], "home_team_id": fx["away"], "away_team_id": fx["home"],
+                         "points": np.where(points == 1.0, 1.0, 3.0 - points), "gd": fx["ag"] - fx["hg"], "xgd": axg - hxg})
+    return pd.concat([home, away], ignore_index=True)
+
+
+def summarise(games, sums):
+    # No earlier meeting: 0 games and neutral averages, so the forest never sees a NaN
+    means = np.divide(sums, games[:, None], out=np.zeros_like(sums), where=games[:, None] > 0)
+    return np.column_stack([games, means])
+
+
+# --- 1. FULL BUILD ---
+def build_head_to_head(matches, window=H2H_WINDOW):
+    """One row per team per meeting: this meeting's stats and the head-to-head before it."""
+    rows = meeting_rows(matches).sort_values(["home_team_id", "away_team_id", "date"], kind="mergesort")
+    rows = rows.reset_index(drop=True)
+    pairs = rows.groupby(["home_team_id", "away_team_id"], sort=False)
+    # Window sums from per-pair prefix sums (rolling() per group is far slower with this
+    # many small groups): everything before the meeting, minus everything before the window
+    values = rows[H2H_STATS].to_numpy(dtype=float)
+    before = pairs[H2H_STATS].cumsum().to_numpy() - values
+    meeting_no = pairs.cumcount().to_numpy()
+    sums = before.copy()
+    full = np.flatnonzero(meeting_no >= window)
+    sums[full] -= before[full - window]
+    rows[H2H_FEATURES] = summarise(np.minimum(meeting_no, window).astype(float), sums)
+    return rows
+
+
+def save_head_to_head(conn, h2h):
+    """Replaces the table's contents (the caller owns the transaction)."""
+    conn.execute(H2H_TABLE)
+    conn.execute("DELETE FROM head_to_head")
+    insert_rows(conn, h2h)
+
+
+H2H_COLUMNS = ["home_team_id", "away_team_id", "date"] + H2H_STATS + H2H_FEATURES
+INSERT_H2H = f"INSERT OR REPLACE INTO head_to_head ({', '.join(H2H_COLUMNS)}) VALUES ({', '.join('?' * len(H2H_COLUMNS))})"
+
+
+def table_rows(h2h):
+    # Plain Python tuples in H2H_COLUMNS order, dates as the TEXT the matches table uses
+    dates = pd.to_datetime(h2h["date"]).dt.strftime("%Y-%m-%d").tolist()
+    ids = zip(h2h["home_team_id"].tolist(), h2h["away_team_id"].tolist())
+    values = h2h[H2H_STATS + H2H_FEATURES].to_numpy(dtype=float).tolist()
+    return [(t, o, d, *v) for (t, o), d, v in zip(ids, dates, values)]
+
+
+def insert_rows(conn, h2h):
+    conn.executemany(INSERT_H2H, table_rows(h2h))
+
+
+# --- 2. EXTEND ---
+def extend_head_to_head(conn, matches, window=H2H_WINDOW):
+    """Adds the meetings in `matches` to the table, in date order, and returns their rows.
+
+    Each needs only the pair's last `window` earlier meetings (one index range read).
+    """
+    rows = meeting_rows(matches).sort_values("date", kind="mergesort").reset_index(drop=True)
+    rows[H2H_FEATURES] = 0.0
+    query = (f"SELECT {', '.join(H2H_STATS)} FROM head_to_head WHERE home_team_id = ? AND away_team_id = ? "
+             "AND date < ? ORDER BY date DESC LIMIT ?")
+    out = []
+    # One at a time: a pair meeting twice in `matches` needs the first meeting stored
+    for team, opp, day, *stats in table_rows(rows):
+        past = conn.execute(query, (team, opp, day, window)).fetchall()
+        games = len(past)
+        means = [sum(col) / games for col in zip(*past)] if games else [0.0] * len(H2H_STATS)
+        row = (team, opp, day, *stats[:len(H2H_STATS)], float(games), *means)
+        conn.execute(INSERT_H2H, row)
+        out.append(row[len(H2H_COLUMNS) - len(H2H_FEATURES):])
+    if out:
+        rows[H2H_FEATURES] = np.array(out)
+    return rows
+
+
+# --- 3. SERVING ---
+def current_head_to_head(conn, pairs=None, window=H2H_WINDOW):
+    """Head-to-head going into each pair's next meeting (its last `window` meetings so far).
+
+    Every pair when pairs is None, otherwise only the given (team, opponent) pairs.
+    """
+    where, params = "", []
+    if pairs:
+        where = "WHERE " + " OR ".join(["(home_team_id = ? AND away_team_id = ?)"] * len(pairs))
+        params = [int(v) for pair in pairs for v in pair]
+    # Primary key order, so this is a straight walk of the table's own index
+    meetings = pd.read_sql(f"SELECT home_team_id, away_team_id, {', '.join(H2H_STATS)} FROM head_to_head {where} "
+                           "ORDER BY home_team_id, away_team_id, date", conn, params=params)
+    recent = meetings.groupby(["home_team_id", "away_team_id"], sort=False).tail(window)
+    grouped = recent.groupby(["home_team_id", "away_team_id"], sort=True)
+    sums = grouped[H2H_STATS].sum()
+    table = pd.DataFrame(summarise(grouped.size().to_numpy(dtype=float), sums.to_numpy()),
+                         index=sums.index, columns=H2H_FEATURES)
+    return table.reset_index()
+
+
+def pair_keys(team_ids, opp_ids):
+    # One int64 per (team, opponent), for hash lookups of many pairs at once
+    return (np.asarray(team_ids, dtype=np.int64) << 32) | np.asarray(opp_ids, dtype=np.int64)
+
+
+class PairIndex:
+    """Immutable lookup from pair_keys() to row numbers: sorted keys and np.searchsorted.
+
+    Nothing is built lazily on first use (a pd.Index builds its hash table then, and
+    concurrent first lookups from several threads can fail), so a new version can be
+    published and read from any number of threads straight away.
+    """
+
+    def __init__(self, keys):
+        self.keys = np.asarray(keys, dtype=np.int64) # Row order, what append() extends
+        self._order = np.argsort(self.keys, kind="stable")
+        self._sorted = self.keys[self._order]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_indexer(self, keys):
+        """Row of each key, -1 where it isn't in the index (same contract as pd.Index)."""
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._sorted, keys), len(self.keys) - 1)
+        return np.where(self._sorted[pos] == keys, self._order[pos], -1)
+
+    def append(self, keys):
+        # New keys get the next row numbers; returns a new index, this one is left alone
+        return PairIndex(np.concatenate([self.keys, np.asarray(keys, dtype=np.int64)]))
+
+
+def has_head_to_head(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'head_to_head'").fetchone() is not None
+
+
+def add_head_to_head(matches_rolling, h2h):
+    """Joins the head-to-head before each match onto the feature rows by date / team / opponent."""
+    rows = matches_rolling.drop(columns=[c for c in H2H_FEATURES if c in matches_rolling])
+    keys = pd.DataFrame({"date": pd.to_datetime(rows["date"]), "home_team_id": rows["home_team_id"],
+                         "away_team_id": rows["away_team_id"]})
+    h2h = h2h[["date", "home_team_id", "away_team_id"] + H2H_FEATURES].assign(date=pd.to_datetime(h2h["date"]))
+    merged = keys.merge(h2h, on=["date", "home_team_id", "away_team_id"], how="left")
+    return rows.assign(**{c: merged[c].fillna(0.0).to_numpy() for c in H2H_FEATURES})
@@ -0,0 +1,191 @@
+import pandas as pd
+import numpy as np
+import copy
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from features import COLS, BASE_WINDOW
+from database.db_setup import MATCH_COLUMNS, create_schema, upsert_matches
+from head_to_head import extend_head_to_head, current_head_to_head, has_head_to_head
+
+# --- LIVE RESULTS ---
+# POST /results: the match goes into SQLite, the two teams' rolling stats and ratings
+# are updated in the version being served straight away, and train_rolling.py runs in
+# a worker process once results stop coming in for a while. Until that retrain lands,
+# every new version (a reload included) gets the pending results re-applied on top.
+
+
+def season_of(date):
+    # Seasons are named after the year they start in (August)
+    return date.year if date.month >= 7 else date.year - 1
+
+
+def result_rows(date, home_id, away_id, home, away, round_name=None, season=None, comp="Premier League"):
+    """Both per-team rows of one fixture, in matches table layout.
+
+    home / away are dicts with "goals" and optionally "xg", "poss", "sh", "sot", "dist".
+    """
+    def side(team, opp, own, other, venue):
+        value = lambda d, k: float(d[k]) if d.get(k) is not None else np.nan
+        gf, ga = own["goals"], other["goals"]
+        return {
+            "date": date.strftime("%Y-%m-%d"), "comp": comp, "round": round_name, "day": date.strftime("%a"),
+            "venue": venue, "result": "W" if gf > ga else "L" if gf < ga else "D",
+            "gf": float(gf), "ga": float(ga), "xg": value(own, "xg"), "xga": value(other, "xg"),
+            "poss": value(own, "poss"), "sh": value(own, "sh"), "sot": value(own, "sot"), "dist": value(own, "dist"),
+            "season": season if season is not None else season_of(date), "home_team_id": team, "away_team_id": opp
+        }
+
+    rows = pd.DataFrame([side(home_id, away_id, home, away, "Home"), side(away_id, home_id, away, home, "Away")])
+    return rows.reindex(columns=list(MATCH_COLUMNS))
+
+
+def store_result(db_path, rows):
+    """Upserts the rows (and their head-to-head entries) in one transaction.
+
+    ValueError, with nothing written, for an unknown team.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A database from before db_setup.py made its indexes gets them here (the upsert
+            # needs the match key, team_form the team/date index)
+            create_schema(conn)
+            ids = sorted(set(rows["home_team_id"]))
+            found = {r[0] for r in conn.execute(
+                f"SELECT team_id FROM teams WHERE team_id IN ({', '.join('?' * len(ids))})", ids)}
+            if set(ids) - found:
+                raise ValueError(f"Unknown team id(s): {sorted(set(ids) - found)}")
+            upsert_matches(conn, rows)
+            if has_head_to_head(conn):
+                extend_head_to_head(conn, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def team_form(conn, team_id, window=BASE_WINDOW):
+    """Rolling stats of the team's latest match, the row a full rebuild would end the team on.
+
+    Mean of the `window` matches before it (NaNs skipped, like rolling().mean()). None when
+    the team has no history yet, or a stat is missing, which the rebuild would drop too.
+    """
+    stats = ", ".join(COLS)
+    rows = conn.execute(
+        f"SELECT {stats} FROM matches WHERE home_team_id = ? "
+        "AND date < (SELECT MAX(date) FROM matches WHERE home_team_id = ?) ORDER BY date DESC LIMIT ?",
+        (team_id, team_id, window)).fetchall()
+    if not rows:
+        return None
+    form = pd.DataFrame(rows, columns=COLS, dtype=float).mean()
+    return None if form.isna().any() else form.to_numpy()
+
+
+def apply_results(res, db_path, results):
+    """New version of `res` with `results` (result_rows frames) applied on top.
+
+    Forms are re-read from SQLite, so applying a result the files already hold changes
+    nothing; ratings step forward for fixtures on or after the last date they've seen
+    that they haven't processed yet (an older one can't be replayed in order, the
+    retrain takes care of it).
+    """
+    teams = sorted({int(t) for rows in results for t in rows["home_team_id"]})
+    pairs = sorted({(int(t), int(o)) for rows in results for t, o in zip(rows["home_team_id"], rows["away_team_id"])})
+    conn = sqlite3.connect(db_path)
+    try:
+        forms = {t: form for t in teams if (form := team_form(conn, t)) is not None}
+        h2h = current_head_to_head(conn, pairs) if res.h2h_index is not None else None
+    finally:
+        conn.close()
+
+    ratings = copy.deepcopy(res.ratings) if res.ratings is not None else None
+    if ratings is not None:
+        for rows in results:
+            new = ratings.unprocessed(rows)
+            if not new.empty:
+                ratings.process(new)
+    return res.with_results(forms, ratings, res.live_results + len(results), h2h, teams)
+
+
+# --- BACKGROUND RETRAIN ---
+def retrain(full, nice=10):
+    # Runs in the worker process: the same code path as running train_rolling.py by hand,
+    # at a lower priority so the API's own threads win the CPU
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+    import train_rolling
+    if full:
+        train_rolling.full_rebuild()
+    else:
+        train_rolling.incremental_update()
+
+
+class RetrainScheduler:
+    """Debounced retrains: one run `delay` seconds after the latest request, never two at once.
+
+    plan() is called when a run starts and returns (full, token); on_done(ok, token, error)
+    when it ends, on a pool thread. Requests during a run queue exactly one more run.
+    """
+
+    def __init__(self, delay, plan, on_done):
+        self.delay = delay
+        self.plan = plan
+        self.on_done = on_done
+        self._lock = threading.Lock()
+        self._timer = None
+        self._pool = None
+        self.running = False
+        self.again = False
+        self.runs = 0
+        self.failures = 0
+        self.last_seconds = None
+
+    def request(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._start)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _start(self):
+        with self._lock:
+            self._timer = None
+            if self.running:
+                self.again = True
+                return
+            self.running = True
+            full, token = self.plan()
+            if self._pool is None:
+                # spawn: forking a process that's running server threads isn't safe
+                self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            started = time.perf_counter()
+            future = self._pool.submit(retrain, full)
+        future.add_done_callback(lambda f: self._finished(f, token, started))
+
+    def _finished(self, future, token, started):
+        error = future.exception()
+        try:
+            self.on_done(error is None, token, error)
+        finally:
+            with self._lock:
+                self.running = False
+                self.runs += 1
+                if error is not None:
+                    self.failures += 1
+                self.last_seconds = round(time.perf_counter() - started, 2)
+                again, self.again = self.again, False
+            if again:
+                self.request()
+
+    def stats(self):
+        with self._lock:
+            return {"running": self.running, "scheduled": self._timer is not None, "runs": self.runs,
+                    "failures": self.failures, "last_seconds": self.last_seconds}
@@ -0,0 +1,122 @@
+import bisect
+import math
+import threading
+
+# --- METRICS ---
+# Minimal counters / gauges / histograms rendered in the Prometheus text format,
+# so the API can expose /metrics without another dependency. Recording is a lock,
+# a bisect and an add, well under a microsecond next to a multi-millisecond request.
+
+# Seconds: 50us up to 2.5s, dense at the low end where the hot-path stages live
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self.values[label_values] = value
+
+    def replace(self, values):
+        # Swap every labelled value at once, e.g. the model info after a reload
+        with self._lock:
+            self.values = dict(values)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {} # label values -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(label_values)
+            if entry is None:
+                entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def lines(self):
+        with self._lock:
+            items = [(k, list(counts), total) for k, (counts, total) in self.values.items()]
+        out = []
+        for k, counts, total in items:
+            running = 0
+            for le, n in zip(self.buckets + (math.inf,), counts):
+                running += n
+                bucket = 'le="' + _number(le) + '"'
+                out.append(f"{self.name}_bucket{_labels(self.labels, k, bucket)} {running}")
+            out.append(f"{self.name}_sum{_labels(self.labels, k)} {_number(total)}")
+            out.append(f"{self.name}_count{_labels(self.labels, k)} {running}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.add(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.add(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS):
+        return self.add(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        out = []
+        for m in self.metrics:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(m.lines())
+        return "\n".join(out) + "\n"
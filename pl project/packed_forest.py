@@ -0,0 +1,132 @@
+import numpy as np
+import json
+import os
+import shutil
+
+# --- PACKED FOREST ---
+# The fitted RandomForest flattened into a handful of NumPy arrays (all trees back to back).
+# Evaluation walks every tree at once, one vectorized step per tree level, which skips
+# sklearn's per-call validation and per-estimator dispatch on the single-row hot path.
+# Results are bit-identical to RandomForestClassifier.predict_proba.
+
+ARRAYS = ["feature", "threshold", "children", "proba", "roots"]
+
+
+class PackedForest:
+    def __init__(self, feature, threshold, children, proba, roots, classes, feature_names, model_fp=None, cover=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children # (n_nodes, 2): left, right. Leaves point at themselves
+        self.proba = proba # Normalized class distribution per node (only leaves are used)
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.model_fp = model_fp # Fingerprint of the joblib model this was exported from
+        self.cover = cover # Weighted training samples per node, for explain.py (None in older exports)
+
+        self._child_flat = self.children.reshape(-1) # child of node i is [2 * i + went_right]
+        self._is_leaf = self.children[:, 0] == np.arange(len(self.children))
+
+    @classmethod
+    def from_sklearn(cls, rf, model_fp=None):
+        feature, threshold, children, proba, roots, cover = [], [], [], [], [], []
+        offset = 0
+        for est in rf.estimators_:
+            tree = est.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            children.append(np.stack([
+                np.where(is_leaf, nodes, tree.children_left),
+                np.where(is_leaf, nodes, tree.children_right)
+            ], axis=1) + offset)
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :rf.n_classes_]
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba.append(value / normalizer)
+            cover.append(tree.weighted_n_node_samples)
+
+            roots.append(offset)
+            offset += tree.node_count
+
+        feature_names = getattr(rf, "feature_names_in_", [f"x{i}" for i in range(rf.n_features_in_)])
+        return cls(
+            np.concatenate(feature).astype(np.int32),
+            np.concatenate(threshold).astype(np.float64),
+            np.ascontiguousarray(np.concatenate(children), dtype=np.int64),
+            np.ascontiguousarray(np.concatenate(proba), dtype=np.float64),
+            np.array(roots, dtype=np.int32),
+            rf.classes_, feature_names,
+            model_fp,
+            np.concatenate(cover).astype(np.float64)
+        )
+
+    def apply(self, X):
+        """Leaf index (into the packed arrays) for every row and tree, shape (n_rows, n_trees)."""
+        # sklearn compares float32 inputs against float64 thresholds, so do the same
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.reshape(-1)
+
+        # One slot per (row, tree); each step moves every path that isn't at a leaf yet
+        node = np.tile(self.roots.astype(np.int64), n_rows)
+        row_start = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, len(self.roots))
+        active = np.flatnonzero(~self._is_leaf[node])
+        at, start = node[active], row_start[active]
+        while active.size:
+            went_right = ~(flat_X[start + self.feature[at]] <= self.threshold[at])
+            at = self._child_flat[2 * at + went_right]
+            node[active] = at
+
+            still = ~self._is_leaf[at]
+            active, at, start = active[still], at[still], start[still]
+        return node.reshape(n_rows, len(self.roots))
+
+    def predict_proba(self, X):
+        leaf_proba = self.proba[self.apply(X)] # (n_rows, n_trees, n_classes)
+        # Summed tree by tree, in order, exactly like the forest accumulates them
+        proba = np.zeros((leaf_proba.shape[0], leaf_proba.shape[2]))
+        for t in range(leaf_proba.shape[1]):
+            proba += leaf_proba[:, t]
+        proba /= leaf_proba.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    # --- SAVE / LOAD ---
+    # A folder of plain .npy files (+ meta.json) so the arrays can be memory-mapped
+    # and shared between API worker processes.
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in ARRAYS + (["cover"] if self.cover is not None else []):
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({
+                "classes": self.classes_.tolist(),
+                "feature_names": self.feature_names_in_.tolist(),
+                "model_fp": self.model_fp
+            }, f)
+
+        # Swap folders: the old export disappears only after the new one is complete
+        old_path = f"{path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None) for name in ARRAYS]
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        cover_path = os.path.join(path, "cover.npy")
+        cover = np.load(cover_path, mmap_mode="r" if mmap else None) if os.path.exists(cover_path) else None
+        return cls(*arrays, meta["classes"], meta["feature_names"], meta["model_fp"], cover)
@@ -0,0 +1,434 @@
+import joblib
+import copy
+import numpy as np
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from features import COLS, rolling_column_names, load_feature_frame, feature_source
+from cache import file_fingerprint, file_signature
+from packed_forest import PackedForest
+from ratings import Ratings, RATING_COLS
+from head_to_head import H2H_FEATURES, PairIndex, current_head_to_head, has_head_to_head, pair_keys
+from explain import TreeExplainer, load_explanations
+
+# --- PREDICTOR ---
+# Feature lookup + scoring shared by the FastAPI service and the Streamlit app's
+# embedded mode: load once, then every prediction is array lookups + one forest pass.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+db_path = os.path.join(BASE_DIR, "database", "premier_league.db")
+model_path = os.path.join(BASE_DIR, "models", "rolling_rf_model.joblib")
+data_path = os.path.join(BASE_DIR, "database", "rolling_data.csv")
+store_path = os.path.join(BASE_DIR, "database", "rolling_data.npy") # Typed copy, preferred when present
+packed_path = os.path.join(BASE_DIR, "models", "rolling_rf_packed")
+ratings_path = os.path.join(BASE_DIR, "database", "ratings.npz")
+explain_path = os.path.join(BASE_DIR, "models", "rolling_rf_explain.npz")
+
+# Largest batch the packed evaluator takes: it wins ~10x on single rows but falls behind
+# sklearn's compiled per-tree loop from a few hundred rows (benchmarks/bench_forest.py)
+PACKED_MAX_ROWS = 256
+
+# The model was fitted on a DataFrame but we score plain arrays on the hot path
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+cols = rolling_column_names(COLS)
+result_map = {0: "Away Win", 1: "Draw", 2: "Home Win"}
+
+_local = threading.local()
+
+
+# --- TEAM INDEX ---
+# One row per team holding its latest rolling stats, so a request is an array lookup
+# instead of a boolean scan over the whole history.
+def build_team_index(rolling_data):
+    # A team's latest row is its last one (rows are in team/date order, appends go at the end)
+    all_ids = np.asarray(rolling_data["home_team_id"], dtype=np.int64)
+    last_from_end = np.unique(all_ids[::-1], return_index=True)[1]
+    latest = np.sort(len(all_ids) - 1 - last_from_end)
+    team_ids = all_ids[latest]
+
+    team_pos = np.full(team_ids.max() + 1, -1, dtype=np.int64)
+    team_pos[team_ids] = np.arange(len(team_ids))
+    matrix = np.column_stack([np.asarray(rolling_data[c], dtype=np.float64)[latest] for c in cols])
+    return team_pos, np.ascontiguousarray(matrix)
+
+
+def build_pair_index(h2h):
+    # Sorted (team, opponent) keys: get_indexer is one binary search per pair, safe from any thread
+    keys = PairIndex(pair_keys(h2h["home_team_id"], h2h["away_team_id"]))
+    return keys, np.ascontiguousarray(h2h[H2H_FEATURES].to_numpy(dtype=np.float64))
+
+
+def load_pair_index(db_path):
+    if not db_path or not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        return build_pair_index(current_head_to_head(conn)) if has_head_to_head(conn) else None
+    finally:
+        conn.close()
+
+
+def index_explanations(saved):
+    # Same immutable (home, away) lookup as the head-to-head one
+    if saved is None:
+        return None
+    return dict(saved, index=PairIndex(pair_keys(saved["home"], saved["away"])))
+
+
+class LazyModel:
+    """The sklearn forest, unpickled once, the first time something asks for it.
+
+    Shared by every version made from the same load (with_results copies keep it).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._model = None
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        with self._lock:
+            if self._model is None:
+                # No mmap_mode: sklearn's Tree.__setstate__ copies the node arrays anyway
+                self._model = joblib.load(self.path)
+        return self._model
+
+
+def current_features():
+    # Read at call time, so a store written after startup is picked up on the next reload
+    return feature_source(store_path, data_path)
+
+
+def input_rows(n, width):
+    # Preallocated per thread (sync routes run on a threadpool), grown on demand
+    buf = getattr(_local, "buf", None)
+    if buf is None or len(buf) < n or buf.shape[1] != width:
+        buf = _local.buf = np.empty((max(n, 1), width), dtype=np.float64)
+    return buf[:n]
+
+
+class Predictor:
+    """One immutable version of model + feature index.
+
+    Callers grab a version once and use only that, so a reload is a single
+    reference swap and in-flight requests finish on the version they started with.
+    """
+
+    def __init__(self, model_path=model_path, data_path=None, mmap=False, packed_path=packed_path, ratings_path=ratings_path,
+                 db_path=db_path, explain_path=explain_path):
+        data_path = data_path or current_features()
+        if not os.path.exists(model_path) or not os.path.exists(data_path):
+            raise FileNotFoundError("Model or Data not found. Run train_rolling.py first.")
+
+        start = time.perf_counter()
+        self.signature = (file_signature(model_path), file_signature(data_path))
+        self.model_fp = file_fingerprint(model_path)
+        self.data_fp = file_fingerprint(data_path)
+        # The packed export serves small batches and describes the model (classes_, feature_names_in_),
+        # so by default the joblib file is only read for a large batch or an old export
+        self.packed = self.load_packed(packed_path, mmap)
+        self.sklearn = LazyModel(model_path)
+        self.model = self.packed if self.packed is not None else self.sklearn.get()
+        self.evaluator = "packed" if self.packed is not None else "sklearn" # Small batches only, see forest_for()
+        self.data_path = data_path
+        self.team_pos, self.feature_matrix = build_team_index(load_feature_frame(data_path, ["home_team_id"] + cols))
+        # Current Elo / attack / defence per team, straight from the engine's saved state
+        self.ratings = Ratings.load(ratings_path) if ratings_path and os.path.exists(ratings_path) else None
+        self.rating_matrix = self.ratings.table() if self.ratings is not None else None
+        self.file_data_fp = self.data_fp
+        self.processed_through = self.ratings.last_date if self.ratings is not None else None # Last match in the files
+        self.live_results = 0 # Results applied in memory on top of the files (see with_results)
+        self.loaded_at = time.time()
+        self.matrix = None # Full matchup matrix, built on first request for this version
+        self.matrix_lock = threading.Lock()
+
+        default = cols + ["home_team_id", "away_team_id", "venue_code"]
+        self.predictors = list(getattr(self.model, "feature_names_in_", default))
+
+        # Where each model input comes from: home team's rolling stats, or the ids/venue
+        self.stat_slots = np.array([i for i, p in enumerate(self.predictors) if p in cols])
+        self.stat_src = np.array([cols.index(p) for p in self.predictors if p in cols])
+        self.home_slot = self.predictors.index("home_team_id")
+        self.away_slot = self.predictors.index("away_team_id")
+        self.venue_slot = self.predictors.index("venue_code")
+        own = [f"{c}_rating" for c in RATING_COLS]
+        opp = [f"opp_{c}_rating" for c in RATING_COLS]
+        self.rating_slots = np.array([i for i, p in enumerate(self.predictors) if p in own], dtype=np.int64)
+        self.rating_src = np.array([own.index(p) for p in self.predictors if p in own], dtype=np.int64)
+        self.opp_rating_slots = np.array([i for i, p in enumerate(self.predictors) if p in opp], dtype=np.int64)
+        self.opp_rating_src = np.array([opp.index(p) for p in self.predictors if p in opp], dtype=np.int64)
+        self.uses_ratings = len(self.rating_slots) + len(self.opp_rating_slots) > 0
+        if self.uses_ratings and self.ratings is None:
+            raise FileNotFoundError("Model needs team ratings but none were found. Run train_rolling.py first.")
+        # Head-to-head going into each pair's next meeting, held in memory for O(1) lookups
+        self.h2h_slots = np.array([i for i, p in enumerate(self.predictors) if p in H2H_FEATURES], dtype=np.int64)
+        self.h2h_src = np.array([H2H_FEATURES.index(p) for p in self.predictors if p in H2H_FEATURES], dtype=np.int64)
+        pairs = load_pair_index(db_path) if len(self.h2h_slots) else None
+        self.h2h_index, self.h2h_matrix = pairs if pairs is not None else (None, None)
+        if len(self.h2h_slots) and self.h2h_index is None:
+            raise FileNotFoundError("Model needs the head-to-head index but none was found. Run train_rolling.py first.")
+
+        # Feature attributions: this season's pairings as saved by train_rolling.py (only if
+        # they were computed for this exact model and features), anything else on request
+        self.explainer = TreeExplainer(self.explain_forest)
+        self.explained = index_explanations(load_explanations(explain_path, self.model_fp, self.data_fp))
+        self.load_seconds = time.perf_counter() - start
+
+    def with_results(self, forms, ratings, live_results, h2h=None, teams=()):
+        """A new version with fresh rolling stats for some teams, for results not yet in the files.
+
+        forms is {team_id: row of rolling stats in `cols` order}, ratings the Ratings with
+        those results applied, h2h current_head_to_head() rows for the pairs that played,
+        teams every team that played. The model and everything else are shared with this version.
+        """
+        fresh = copy.copy(self)
+        ids = np.array(sorted(forms), dtype=np.int64)
+        team_pos = self.team_pos
+        if len(ids) and ids.max() >= len(team_pos):
+            team_pos = np.concatenate([team_pos, np.full(ids.max() + 1 - len(team_pos), -1, dtype=np.int64)])
+        else:
+            team_pos = team_pos.copy()
+        new = ids[team_pos[ids] < 0] if len(ids) else ids
+        team_pos[new] = len(self.feature_matrix) + np.arange(len(new))
+        matrix = np.concatenate([self.feature_matrix, np.empty((len(new), len(cols)))])
+        for t in ids:
+            matrix[team_pos[t]] = forms[t]
+
+        fresh.team_pos, fresh.feature_matrix = team_pos, matrix
+        if ratings is not None:
+            fresh.ratings, fresh.rating_matrix = ratings, ratings.table()
+        if h2h is not None and self.h2h_index is not None:
+            keys, values = pair_keys(h2h["home_team_id"], h2h["away_team_id"]), h2h[H2H_FEATURES].to_numpy(dtype=np.float64)
+            rows = self.h2h_index.get_indexer(keys)
+            fresh.h2h_matrix = self.h2h_matrix.copy()
+            fresh.h2h_matrix[rows[rows >= 0]] = values[rows >= 0]
+            fresh.h2h_index = self.h2h_index.append(keys[rows < 0])
+            fresh.h2h_matrix = np.concatenate([fresh.h2h_matrix, values[rows < 0]])
+        if self.explained is not None and len(teams):
+            # Saved explanations of pairings whose inputs just changed no longer hold
+            saved = self.explained
+            keep = ~(np.isin(saved["home"], teams) | np.isin(saved["away"], teams))
+            fresh.explained = index_explanations({"base": saved["base"], **{k: saved[k][keep] for k in ["home", "away", "values"]}})
+        # A new feature version as far as caches are concerned
+        fresh.live_results = live_results
+        fresh.data_fp = f"{self.file_data_fp}+{live_results}" if live_results else self.file_data_fp
+        fresh.matrix, fresh.matrix_lock = None, threading.Lock()
+        return fresh
+
+    def load_packed(self, packed_path, mmap):
+        # The packed export only counts if it came from this exact model file
+        if packed_path and os.path.exists(packed_path):
+            packed = PackedForest.load(packed_path, mmap)
+            if packed.model_fp == self.model_fp:
+                return packed
+        return None
+
+    def forest_for(self, n_rows):
+        # Same predict_proba / classes_ either way, and bit-identical probabilities
+        if self.packed is not None and n_rows <= PACKED_MAX_ROWS:
+            return self.packed
+        return self.sklearn.get()
+
+    def team_rows(self, team_ids):
+        # Index row per team id, -1 when we have no history for it
+        ids = np.asarray(team_ids, dtype=np.int64)
+        known = (ids >= 0) & (ids < len(self.team_pos))
+        return np.where(known, self.team_pos[np.where(known, ids, 0)], -1)
+
+    def predict_probabilities(self, home_ids, away_ids, timings=None):
+        """Returns (class probabilities for the fixtures we have data for, mask of those fixtures).
+
+        Pass a dict as timings to get the seconds spent in each stage added to it.
+        """
+        t0 = time.perf_counter()
+        home_ids = np.asarray(home_ids, dtype=np.int64)
+        away_ids = np.asarray(away_ids, dtype=np.int64)
+        h_rows, ok = self.usable(home_ids, away_ids)
+        t1 = time.perf_counter()
+
+        # 1. Prepare Input for Model (Home Perspective)
+        n = int(ok.sum())
+        input_data = self.model_inputs(home_ids[ok], away_ids[ok], h_rows[ok], input_rows(n, len(self.predictors)))
+        t2 = time.perf_counter()
+
+        # 2. One forest evaluation for the whole batch
+        if n == 0:
+            probabilities = np.empty((0, len(self.model.classes_)))
+        else:
+            probabilities = self.forest_for(n).predict_proba(input_data)
+        if timings is not None:
+            timings.update(lookup=t1 - t0, assemble=t2 - t1, forest=time.perf_counter() - t2)
+        return probabilities, ok
+
+    def usable(self, home_ids, away_ids):
+        # Home team's index row, and which fixtures have everything the model needs
+        h_rows = self.team_rows(home_ids)
+        ok = (h_rows >= 0) & (self.team_rows(away_ids) >= 0)
+        if self.uses_ratings:
+            ok &= self.ratings.known(home_ids) & self.ratings.known(away_ids)
+        return h_rows, ok
+
+    def model_inputs(self, home_ids, away_ids, h_rows, out):
+        """Fills `out` (n, len(predictors)) with the model inputs of usable fixtures."""
+        out[:, self.stat_slots] = self.feature_matrix[h_rows][:, self.stat_src]
+        out[:, self.home_slot] = home_ids
+        out[:, self.away_slot] = away_ids
+        out[:, self.venue_slot] = 1
+        if self.uses_ratings:
+            out[:, self.rating_slots] = self.rating_matrix[home_ids][:, self.rating_src]
+            out[:, self.opp_rating_slots] = self.rating_matrix[away_ids][:, self.opp_rating_src]
+        if self.h2h_index is not None:
+            out[:, self.h2h_slots] = self.head_to_head(home_ids, away_ids)[:, self.h2h_src]
+        return out
+
+    def team_stats(self, row):
+        return dict(zip(cols, self.feature_matrix[row].tolist()))
+
+    def head_to_head(self, home_ids, away_ids):
+        """(n, len(H2H_FEATURES)) for the pairs, zeros (no meetings) where there's no entry."""
+        rows = self.h2h_index.get_indexer(pair_keys(home_ids, away_ids))
+        return np.where((rows >= 0)[:, None], self.h2h_matrix[np.maximum(rows, 0)], 0.0)
+
+    def score_fixtures(self, home_ids, away_ids, include_stats=True, timings=None):
+        """Scores any number of fixtures with a single predict_proba call, results in input order."""
+        probabilities, ok = self.predict_probabilities(home_ids, away_ids, timings)
+        start = time.perf_counter()
+        # The prediction is just the most likely class
+        pred_codes = self.model.classes_[probabilities.argmax(axis=1)]
+        h_rows = self.team_rows(home_ids)
+        a_rows = self.team_rows(away_ids)
+        if include_stats and self.h2h_index is not None:
+            h2h = self.head_to_head(np.asarray(home_ids)[ok], np.asarray(away_ids)[ok])
+
+        results = []
+        scored = iter(range(len(probabilities)))
+        for h_row, a_row, valid in zip(h_rows, a_rows, ok):
+            if not valid:
+                results.append({"error": "Insufficient data"})
+                continue
+            i = next(scored)
+            probs = probabilities[i] # [prob_loss, prob_draw, prob_win]
+            result = {
+                "prediction": result_map[pred_codes[i]],
+                "probs": {
+                    "away": round(float(probs[0]), 2),
+                    "draw": round(float(probs[1]), 2),
+                    "home": round(float(probs[2]), 2)
+                }
+            }
+            if include_stats:
+                result["stats"] = {"home": self.team_stats(h_row), "away": self.team_stats(a_row)}
+                if self.h2h_index is not None:
+                    result["head_to_head"] = dict(zip(H2H_FEATURES, h2h[i].tolist()))
+            results.append(result)
+        if timings is not None:
+            timings["format"] = time.perf_counter() - start
+        return results
+
+    def predict_match(self, home_id, away_id, timings=None):
+        return self.score_fixtures([home_id], [away_id], timings=timings)[0]
+
+    # --- EXPLANATIONS ---
+    def explain_forest(self):
+        # The packed export carries node covers; without one (or with an export from before
+        # covers were saved) the sklearn model is packed here, once, on the first explanation
+        if getattr(self.packed, "cover", None) is not None:
+            return self.packed
+        return PackedForest.from_sklearn(self.sklearn.get())
+
+    def shap_values(self, home_ids, away_ids):
+        """(TreeSHAP values (n_usable, classes, features), model inputs, mask of usable fixtures)."""
+        home_ids = np.asarray(home_ids, dtype=np.int64)
+        away_ids = np.asarray(away_ids, dtype=np.int64)
+        h_rows, ok = self.usable(home_ids, away_ids)
+        inputs = self.model_inputs(home_ids[ok], away_ids[ok], h_rows[ok], np.empty((int(ok.sum()), len(self.predictors))))
+        return self.explainer.shap_values(inputs), inputs, ok
+
+    def stored_explanation(self, home_id, away_id):
+        """The pairing's explanation from the file train_rolling.py saved, None if it isn't there."""
+        if self.explained is None:
+            return None
+        row = self.explained["index"].get_indexer(pair_keys([home_id], [away_id]))[0]
+        if row < 0:
+            return None
+        h_rows, ok = self.usable([home_id], [away_id])
+        inputs = self.model_inputs(np.array([home_id]), np.array([away_id]), h_rows, np.empty((1, len(self.predictors))))
+        return self.explanation_result(self.explained["values"][row], self.explained["base"], inputs[0])
+
+    def explain_match(self, home_id, away_id):
+        """Per-feature contributions to each outcome probability, computed now (tens of ms)."""
+        values, inputs, ok = self.shap_values([home_id], [away_id])
+        if not ok[0]:
+            return {"error": "Insufficient data"}
+        return self.explanation_result(values[0], self.explainer.expected_value, inputs[0])
+
+    def explanation_result(self, values, base, inputs):
+        # values is (classes, features); base + contributions = the predicted probabilities
+        probs = base + values.sum(axis=1)
+        code = self.model.classes_[probs.argmax()]
+        order = np.argsort(-np.abs(values[probs.argmax()]), kind="stable") # Biggest push on the pick first
+        outcomes = ["away", "draw", "home"]
+        return {
+            "prediction": result_map[code],
+            "probs": {k: round(float(p), 2) for k, p in zip(outcomes, probs)},
+            "base": {k: round(float(p), 4) for k, p in zip(outcomes, base)},
+            "contributions": [
+                {"feature": self.predictors[i], "value": float(inputs[i]),
+                 **{k: round(float(v), 4) for k, v in zip(outcomes, values[:, i])}}
+                for i in order
+            ]
+        }
+
+    def matchup_matrix(self, names):
+        """Every home/away pairing of the named teams we have data for, in one forest pass.
+
+        Computed once per version; names is {team_id: team_name}.
+        """
+        with self.matrix_lock:
+            if self.matrix is None:
+                self.matrix = self._build_matrix(names)
+        return self.matrix
+
+    def ratings_table(self, names):
+        """Current ratings of every rated team, strongest Elo first. names is {team_id: team_name}."""
+        ids = np.flatnonzero(self.ratings.games > 0)
+        order = ids[np.argsort(-self.rating_matrix[ids, 0], kind="stable")]
+        return {
+            "as_of": str(self.ratings.last_date.date()),
+            "home_advantage": {"elo": round(self.ratings.elo_home, 1), "xg_factor": round(float(np.exp(self.ratings.xg_home)), 3)},
+            "teams": [
+                {"team_id": int(t), "team_name": names.get(int(t)), "games": int(self.ratings.games[t]),
+                 **{c: round(float(v), 3) for c, v in zip(RATING_COLS, self.rating_matrix[t])}}
+                for t in order
+            ]
+        }
+
+    def _build_matrix(self, names):
+        ids = np.array(sorted(t for t in names if self.team_rows([t])[0] >= 0), dtype=np.int64)
+        n = len(ids)
+
+        # All n*(n-1) ordered pairs as one batch
+        home_ids, away_ids = np.repeat(ids, n), np.tile(ids, n)
+        pairs = home_ids != away_ids
+        probabilities, _ = self.predict_probabilities(home_ids[pairs], away_ids[pairs])
+        pred_codes = self.model.classes_[probabilities.argmax(axis=1)]
+
+        grids = {k: np.full(n * n, None, dtype=object) for k in ["away", "draw", "home", "prediction"]}
+        for k, key in enumerate(["away", "draw", "home"]):
+            grids[key][pairs] = [round(float(p), 2) for p in probabilities[:, k]]
+        grids["prediction"][pairs] = [result_map[c] for c in pred_codes]
+
+        return {
+            "model": self.model_fp,
+            "features": self.data_fp,
+            "teams": [{"team_id": int(t), "team_name": names[t]} for t in ids],
+            **{k: g.reshape(n, n).tolist() for k, g in grids.items()},
+            "stats": {str(t): self.team_stats(r) for t, r in zip(ids, self.team_rows(ids))}
+        }
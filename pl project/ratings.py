@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+import math
+
+# --- RATING ENGINE ---
+# Long-run team strength, updated one match at a time in date order:
+#   - Elo from results (goal-difference weighted, learned home advantage)
+#   - attack / defence from xG: a log-linear xG model nudged towards every match's
+#     actual xG, so each side's rating drifts at a steady rate rather than a window
+# State is a few per-team arrays plus three scalars; a new result is O(1) to apply,
+# so the API and train_rolling.py --incremental never replay history.
+
+ELO_START = 1500.0
+ELO_K = 20.0
+ELO_HOME_START = 60.0 # Elo points, learned from there
+ELO_HOME_K = 2.0
+XG_START = 1.35 # League xG per team per game, learned from there
+XG_RATE = 0.04 # Step for a team's attack/defence per unit of xG error
+XG_GLOBAL_RATE = 0.002 # Step for league level and home advantage
+
+RATING_COLS = ["elo", "attack", "defence"]
+RATING_FEATURES = [f"{c}_rating" for c in RATING_COLS] + [f"opp_{c}_rating" for c in RATING_COLS]
+
+
+def goal_weight(gd):
+    # World Football Elo margin multiplier
+    gd = abs(gd)
+    return 1.0 if gd <= 1 else 1.5 if gd == 2 else (11.0 + gd) / 8.0
+
+
+def fixtures_from_matches(matches):
+    """One row per fixture (home side first) in date order, from the per-team match rows.
+
+    Either perspective is enough; where both exist they describe the same game.
+    """
+    home = matches[matches["venue"] == "Home"]
+    away = matches[matches["venue"] != "Home"]
+    fixtures = pd.concat([
+        pd.DataFrame({"date": home["date"], "home": home["home_team_id"], "away": home["away_team_id"],
+                      "hg": home["gf"], "ag": home["ga"], "hxg": home["xg"], "axg": home["xga"]}),
+        pd.DataFrame({"date": away["date"], "home": away["away_team_id"], "away": away["home_team_id"],
+                      "hg": away["ga"], "ag": away["gf"], "hxg": away["xga"], "axg": away["xg"]})
+    ], ignore_index=True)
+    fixtures["date"] = pd.to_datetime(fixtures["date"])
+    fixtures = fixtures.drop_duplicates(["date", "home", "away"])
+    return fixtures.sort_values(["date", "home"], kind="mergesort").reset_index(drop=True)
+
+
+class Ratings:
+    def __init__(self, n_teams=0):
+        self.elo = np.full(n_teams, ELO_START)
+        self.attack = np.zeros(n_teams) # log-scale xG for, relative to the league
+        self.defence = np.zeros(n_teams) # log-scale xG conceded, relative to the league (higher = leakier)
+        self.games = np.zeros(n_teams, dtype=np.int64)
+        self.elo_home = ELO_HOME_START
+        self.xg_base = math.log(XG_START)
+        self.xg_home = 0.0
+        self.last_date = None
+        self.last_fixtures = set() # (date, home, away) of the fixtures processed on last_date
+
+    def grow(self, n_teams):
+        extra = n_teams - len(self.elo)
+        if extra > 0:
+            self.elo = np.append(self.elo, np.full(extra, ELO_START))
+            self.attack = np.append(self.attack, np.zeros(extra))
+            self.defence = np.append(self.defence, np.zeros(extra))
+            self.games = np.append(self.games, np.zeros(extra, dtype=np.int64))
+
+    # --- 1. STREAMING PASS ---
+    def process(self, matches):
+        """Applies every fixture in `matches` (per-team rows) in date order.
+
+        Returns the pre-match ratings for both perspectives of every fixture, keyed by
+        date / home_team_id / away_team_id like the match rows they belong to.
+        """
+        fx = fixtures_from_matches(matches)
+        n = len(fx)
+        if n == 0:
+            return pd.DataFrame(columns=["date", "home_team_id", "away_team_id"] + RATING_FEATURES)
+        self.grow(int(max(fx["home"].max(), fx["away"].max())) + 1)
+
+        # Plain lists: per-element numpy indexing would cost more than the arithmetic
+        elo, att, dfn, games = self.elo.tolist(), self.attack.tolist(), self.defence.tolist(), self.games.tolist()
+        elo_home, base, xg_home = self.elo_home, self.xg_base, self.xg_home
+        pre = []
+        exp = math.exp
+        hxg = fx["hxg"].fillna(fx["hg"]).tolist() # Goals stand in for a missing xG
+        axg = fx["axg"].fillna(fx["ag"]).tolist()
+
+        for i, (h, a, hg, ag) in enumerate(zip(fx["home"].tolist(), fx["away"].tolist(), fx["hg"].tolist(), fx["ag"].tolist())):
+            pre.append((elo[h], att[h] + base, dfn[h] + base, elo[a], att[a] + base, dfn[a] + base))
+
+            # Elo
+            expected = 1.0 / (1.0 + 10.0 ** ((elo[a] - elo[h] - elo_home) / 400.0))
+            score = 1.0 if hg > ag else 0.5 if hg == ag else 0.0
+            delta = ELO_K * goal_weight(hg - ag) * (score - expected)
+            elo[h] += delta
+            elo[a] -= delta
+            elo_home += ELO_HOME_K * (score - expected)
+
+            # xG: one Poisson gradient step on each side's log rate
+            err_h = hxg[i] - exp(base + xg_home + att[h] + dfn[a])
+            err_a = axg[i] - exp(base + att[a] + dfn[h])
+            att[h] += XG_RATE * err_h
+            dfn[a] += XG_RATE * err_h
+            att[a] += XG_RATE * err_a
+            dfn[h] += XG_RATE * err_a
+            xg_home += XG_GLOBAL_RATE * err_h
+            base += XG_GLOBAL_RATE * (err_h + err_a)
+            games[h] += 1
+            games[a] += 1
+
+        self.elo, self.attack, self.defence = np.array(elo), np.array(att), np.array(dfn)
+        self.games = np.array(games, dtype=np.int64)
+        self.elo_home, self.xg_base, self.xg_home = elo_home, base, xg_home
+        last_date = fx["date"].iloc[-1]
+        on_last = fx[fx["date"] == last_date]
+        done = set(zip(on_last["date"], on_last["home"].tolist(), on_last["away"].tolist()))
+        # More fixtures on the same day (live results) add to the ones already processed
+        self.last_fixtures = self.last_fixtures | done if last_date == self.last_date else done
+        self.last_date = last_date
+
+        # Reported on the xG scale: expected xG for / against an average side at a neutral venue
+        pre = np.array(pre)
+        pre[:, [1, 2, 4, 5]] = np.exp(pre[:, [1, 2, 4, 5]])
+        home_rows = pd.DataFrame(pre, columns=RATING_FEATURES)
+        away_rows = pd.DataFrame(pre[:, [3, 4, 5, 0, 1, 2]], columns=RATING_FEATURES)
+        return pd.concat([
+            home_rows.assign(date=fx["date"], home_team_id=fx["home"], away_team_id=fx["away"]),
+            away_rows.assign(date=fx["date"], home_team_id=fx["away"], away_team_id=fx["home"])
+        ], ignore_index=True)[["date", "home_team_id", "away_team_id"] + RATING_FEATURES]
+
+    # --- 2. CURRENT VALUES ---
+    def table(self):
+        """(n_teams, 3) current elo / attack / defence, same scale as the features."""
+        return np.column_stack([self.elo, np.exp(self.attack + self.xg_base), np.exp(self.defence + self.xg_base)])
+
+    def unprocessed(self, matches):
+        """The rows of `matches` process() can still apply in date order: fixtures on or
+        after last_date that it hasn't processed yet."""
+        if self.last_date is None:
+            return matches
+        fx_keys = fixtures_from_matches(matches)[["date", "home", "away"]]
+        fresh = {k for k in zip(fx_keys["date"], fx_keys["home"].tolist(), fx_keys["away"].tolist())
+                 if k[0] >= self.last_date and k not in self.last_fixtures}
+        # Either perspective's row identifies its fixture
+        home_side = (matches["venue"] == "Home").to_numpy()
+        home = np.where(home_side, matches["home_team_id"], matches["away_team_id"]).tolist()
+        away = np.where(home_side, matches["away_team_id"], matches["home_team_id"]).tolist()
+        keys = zip(pd.to_datetime(matches["date"]), home, away)
+        return matches[[k in fresh for k in keys]]
+
+    def known(self, team_ids):
+        ids = np.asarray(team_ids, dtype=np.int64)
+        inside = (ids >= 0) & (ids < len(self.games))
+        return inside & (self.games[np.where(inside, ids, 0)] > 0)
+
+    # --- 3. SAVE / LOAD ---
+    def save(self, path):
+        with open(path, "wb") as f: # A file object, so np.savez doesn't rename a temp path
+            np.savez(f, elo=self.elo, attack=self.attack, defence=self.defence, games=self.games,
+                     scalars=np.array([self.elo_home, self.xg_base, self.xg_home]),
+                     last_date=np.array(str(self.last_date.date()) if self.last_date is not None else ""),
+                     last_fixtures=np.array(sorted((h, a) for _, h, a in self.last_fixtures), dtype=np.int64).reshape(-1, 2))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            ratings = cls()
+            ratings.elo, ratings.attack, ratings.defence = data["elo"], data["attack"], data["defence"]
+            ratings.games = data["games"]
+            ratings.elo_home, ratings.xg_base, ratings.xg_home = data["scalars"].tolist()
+            last_date = str(data["last_date"])
+            ratings.last_date = pd.Timestamp(last_date) if last_date else None
+            # Files saved before this was tracked have none
+            pairs = data["last_fixtures"].tolist() if "last_fixtures" in data else []
+            ratings.last_fixtures = {(ratings.last_date, h, a) for h, a in pairs}
+        return ratings
+
+
+def add_ratings(matches_rolling, pre):
+    """Joins pre-match ratings onto feature rows by date / team / opponent."""
+    if pre.empty:
+        return matches_rolling.assign(**{c: np.nan for c in RATING_FEATURES})
+    rows = matches_rolling.drop(columns=[c for c in RATING_FEATURES if c in matches_rolling])
+    dates = pd.to_datetime(rows["date"])
+    merged = pd.DataFrame({"date": dates, "home_team_id": rows["home_team_id"], "away_team_id": rows["away_team_id"]})
+    merged = merged.merge(pre, on=["date", "home_team_id", "away_team_id"], how="left")
+    return rows.assign(**{c: merged[c].to_numpy() for c in RATING_FEATURES})
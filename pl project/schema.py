@@ -0,0 +1,80 @@
+import pandas as pd
+import os
+
+# --- COLUMN SCHEMA ---
+# Which columns the pipeline reads and what they're held as. Training, the API and
+# experiment_runner.py all load through here, so no frame carries columns nobody uses
+# (captain, formation, attendance...), repeated strings are stored once as categoricals
+# and ids / codes are downcast. Columns not listed (match stats, rolling means, ratings)
+# stay float64, so every feature comes out exactly as it did before.
+
+MATCH_SCHEMA = {
+    "date": "date", "season": "int", "comp": "category", "round": "category", "venue": "category", "result": "category",
+    "home_team_id": "int", "away_team_id": "int"
+}
+
+# rolling_data.csv: the match keys plus the codes add_targets() derives
+FEATURE_SCHEMA = dict(MATCH_SCHEMA, venue_code="int", target="int")
+
+
+def apply_schema(df, schema):
+    """Converts the schema's columns in place (missing ones are skipped) and returns df."""
+    for c, kind in schema.items():
+        if c not in df:
+            continue
+        if kind == "date":
+            df[c] = pd.to_datetime(df[c])
+        elif kind == "category":
+            df[c] = df[c].astype("category")
+        elif kind == "int":
+            df[c] = pd.to_numeric(df[c], downcast="integer") # Narrowest signed type that fits
+    return df
+
+
+def read_matches(conn, columns, since=None):
+    """Only `columns` of the matches table (optionally on or after `since`), typed by MATCH_SCHEMA."""
+    query = "SELECT " + ", ".join(f'"{c}"' for c in columns) + " FROM matches"
+    if since is None:
+        df = pd.read_sql(query, conn)
+    else:
+        df = pd.read_sql(query + " WHERE date >= ?", conn, params=(since,))
+    return apply_schema(df, MATCH_SCHEMA)
+
+
+def read_feature_csv(path, columns=None):
+    # Categoricals straight from the parser, so the strings are never held per row
+    header = pd.read_csv(path, nrows=0).columns
+    dtype = {c: "category" for c, kind in FEATURE_SCHEMA.items() if kind == "category" and c in header}
+    df = pd.read_csv(path, usecols=columns, dtype=dtype)
+    return apply_schema(df, {c: k for c, k in FEATURE_SCHEMA.items() if k != "category"})
+
+
+# --- MEMORY REPORT ---
+def frame_mb(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def rss_mb():
+    """(current, peak) resident memory of this process in MB; None where the OS won't say."""
+    current = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource # Not on Windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6 # KiB on Linux
+    except ImportError:
+        pass
+    return current, peak
+
+
+def memory_report(stage, df=None):
+    current, peak = rss_mb()
+    parts = [f"{len(df)} rows, {frame_mb(df):.1f} MB in frame"] if df is not None else []
+    if current is not None:
+        parts.append(f"RSS {current:.0f} MB")
+    if peak is not None:
+        parts.append(f"peak {peak:.0f} MB")
+    print(f"🧠 {stage}: " + ", ".join(parts))
@@ -0,0 +1,157 @@
+import pandas as pd
+import numpy as np
+import sqlite3
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from predictor import Predictor
+
+# --- MONTE CARLO SEASON SIMULATOR ---
+# Outcome probabilities for every remaining fixture are computed once with the RF model,
+# then whole seasons are sampled as NumPy arrays (sims x fixtures), chunk by chunk.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+db_path = os.path.join(BASE_DIR, "database", "premier_league.db")
+
+POINTS = {"W": 3, "D": 1, "L": 0}
+# Outcome codes follow the model classes (home perspective): 0 away win, 1 draw, 2 home win
+HOME_POINTS = np.array([0, 1, 3], dtype=np.float32)
+AWAY_POINTS = np.array([3, 1, 0], dtype=np.float32)
+
+TOP_FOUR = 4
+RELEGATED = 3
+CHUNK = 10_000 # Sims per block, keeps peak memory flat no matter how many sims we run
+
+
+# --- 1. CURRENT SEASON STATE ---
+def load_season(db_path=db_path, season=None):
+    """Current points per team and the fixtures still to play (home_id, away_id)."""
+    conn = sqlite3.connect(db_path)
+    if season is None:
+        season = conn.execute("SELECT MAX(season) FROM matches").fetchone()[0]
+    played = pd.read_sql(
+        "SELECT home_team_id, away_team_id, venue, result FROM matches WHERE season = ?",
+        conn, params=(season,)
+    )
+    conn.close()
+
+    # Every row is one team's view of a match, so points come from that team's own rows
+    team_ids = np.sort(played["home_team_id"].unique())
+    points = played["result"].map(POINTS).groupby(played["home_team_id"]).sum()
+    base_points = points.reindex(team_ids, fill_value=0).to_numpy(dtype=np.float32)
+
+    home = played["venue"] == "Home"
+    done = set(zip(played.loc[home, "home_team_id"], played.loc[home, "away_team_id"]))
+    done |= set(zip(played.loc[~home, "away_team_id"], played.loc[~home, "home_team_id"]))
+
+    # Double round robin minus what's already been played
+    fixtures = np.array(
+        [(h, a) for h in team_ids for a in team_ids if h != a and (h, a) not in done],
+        dtype=np.int64
+    ).reshape(-1, 2)
+    return {"season": int(season), "team_ids": team_ids, "base_points": base_points, "fixtures": fixtures}
+
+
+# --- 2. OUTCOME PROBABILITIES (computed once) ---
+def fill_unknown(scored, known):
+    # Teams with no history yet get the league-average outcome split
+    probs = np.empty((len(known), 3))
+    probs[known] = scored
+    probs[~known] = scored.mean(axis=0) if len(scored) else 1 / 3
+    return probs
+
+
+# --- 3. SAMPLING ---
+def _simulate_block(probs, fixtures, team_ids, base_points, n_sims, seed):
+    """Returns (position counts [team x position], summed points) for n_sims seasons."""
+    rng = np.random.default_rng(seed)
+    n_teams = len(team_ids)
+
+    slot = np.searchsorted(team_ids, fixtures)
+    home_inc = np.zeros((len(fixtures), n_teams), dtype=np.float32)
+    away_inc = np.zeros((len(fixtures), n_teams), dtype=np.float32)
+    home_inc[np.arange(len(fixtures)), slot[:, 0]] = 1
+    away_inc[np.arange(len(fixtures)), slot[:, 1]] = 1
+
+    cum = np.cumsum(probs, axis=1)
+    position_counts = np.zeros((n_teams, n_teams), dtype=np.int64)
+    points_sum = np.zeros(n_teams)
+
+    for start in range(0, n_sims, CHUNK):
+        m = min(CHUNK, n_sims - start)
+        u = rng.random((m, len(fixtures)))
+        outcome = (u >= cum[:, 0]).astype(np.int8) + (u >= cum[:, 1])
+
+        points = base_points + HOME_POINTS[outcome] @ home_inc + AWAY_POINTS[outcome] @ away_inc
+        points_sum += points.sum(axis=0)
+
+        # No goal difference in the sim, so ties on points are broken at random
+        order = np.argsort(-(points + rng.random(points.shape, dtype=np.float32) * 0.5), axis=1)
+        for pos in range(n_teams):
+            position_counts[:, pos] += np.bincount(order[:, pos], minlength=n_teams)
+
+    return position_counts, points_sum
+
+
+def simulate_season(probs, season, n_sims=100_000, seed=None, workers=1):
+    team_ids, base_points, fixtures = season["team_ids"], season["base_points"], season["fixtures"]
+    workers = max(1, min(workers, n_sims))
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    shares = [n_sims // workers + (i < n_sims % workers) for i in range(workers)]
+
+    if workers == 1:
+        parts = [_simulate_block(probs, fixtures, team_ids, base_points, n_sims, seeds[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(
+                _simulate_block,
+                *zip(*[(probs, fixtures, team_ids, base_points, n, s) for n, s in zip(shares, seeds)])
+            ))
+
+    position_counts = sum(p[0] for p in parts)
+    points_sum = sum(p[1] for p in parts)
+    n_teams = len(team_ids)
+
+    table = pd.DataFrame({
+        "team_id": team_ids,
+        "points": base_points.astype(int),
+        "expected_points": points_sum / n_sims,
+        "title": position_counts[:, 0] / n_sims,
+        "top_four": position_counts[:, :min(TOP_FOUR, n_teams)].sum(axis=1) / n_sims,
+        "relegation": position_counts[:, max(n_teams - RELEGATED, 0):].sum(axis=1) / n_sims,
+        "expected_position": (position_counts * np.arange(1, n_teams + 1)).sum(axis=1) / n_sims,
+    })
+    return table.sort_values("expected_points", ascending=False).reset_index(drop=True)
+
+
+def team_names(db_path=db_path):
+    conn = sqlite3.connect(db_path)
+    names = dict(conn.execute("SELECT team_id, team_name FROM teams").fetchall())
+    conn.close()
+    return names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo projection of the final league table.")
+    parser.add_argument("--sims", type=int, default=100_000, help="number of simulated seasons")
+    parser.add_argument("--workers", type=int, default=1, help="processes to split the sims across")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--season", type=int, default=None, help="defaults to the latest season in the DB")
+    args = parser.parse_args()
+
+    print("🎲 Starting Season Simulation...")
+    predictor = Predictor()
+    season = load_season(db_path, args.season)
+    print(f"📅 Season {season['season']}: {len(season['fixtures'])} fixtures left for {len(season['team_ids'])} teams")
+
+    start = time.perf_counter()
+    fixtures = season["fixtures"]
+    probs = fill_unknown(*predictor.predict_probabilities(fixtures[:, 0], fixtures[:, 1]))
+    table = simulate_season(probs, season, args.sims, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+
+    table.insert(1, "team", table["team_id"].map(team_names(db_path)))
+    pd.set_option("display.width", 120)
+    print(table.round(3).to_string(index=False))
+    print(f"✅ Simulated {args.sims:,} seasons in {elapsed:.2f}s")
@@ -0,0 +1,67 @@
+import importlib.util
+import os
+import shutil
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.join(PROJECT_DIR, "benchmarks"))
+from database.db_setup import setup_normalized_db
+from synthetic import generate_matches
+
+
+def scratch_project(folder):
+    """train_rolling.py loaded from a scratch project folder, so every path it writes is in there."""
+    for sub in ["database", "models"]:
+        os.makedirs(os.path.join(folder, sub))
+    shutil.copy(os.path.join(PROJECT_DIR, "train_rolling.py"), folder)
+    spec = importlib.util.spec_from_file_location(f"train_rolling_{os.path.basename(folder)}",
+                                                  os.path.join(folder, "train_rolling.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.explain_pairs = 0
+    return module
+
+
+def ingest(project, matches, name):
+    csv = os.path.join(os.path.dirname(project.db_path), f"{name}.csv")
+    matches.to_csv(csv, index=False)
+    setup_normalized_db(csv, project.db_path)
+
+
+@pytest.fixture
+def project(tmp_path):
+    return scratch_project(str(tmp_path))
+
+
+@pytest.fixture(scope="session")
+def trained(tmp_path_factory):
+    """A scratch project after a full build on synthetic matches. Tests only read it."""
+    project = scratch_project(str(tmp_path_factory.mktemp("trained")))
+    ingest(project, generate_matches(), "matches")
+    project.full_rebuild()
+    return project
+
+
+def load_api(project, mp):
+    """api/main.py serving a scratch project, without the file watcher or retrains.
+
+    mp is a pytest MonkeyPatch: undoing it points predictor.py back at the real files.
+    """
+    import predictor
+    for name in ["model_path", "data_path", "store_path", "packed_path", "ratings_path", "db_path", "explain_path"]:
+        mp.setattr(predictor, name, getattr(project, name))
+    mp.setenv("PL_RELOAD_INTERVAL", "0")
+    mp.setenv("PL_RETRAIN_DELAY", "0")
+    spec = importlib.util.spec_from_file_location("api_main_under_test", os.path.join(PROJECT_DIR, "api", "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def api(trained):
+    with pytest.MonkeyPatch.context() as mp:
+        yield load_api(trained, mp)
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+
+
+def match_count(api):
+    conn = sqlite3.connect(api.db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("side", [{"goals": -1}, {"goals": 1, "xg": -0.5}, {"goals": 1, "poss": 101}, {"goals": 1, "poss": -1},
+                                  {"goals": 1, "sh": -2}, {"goals": 1, "sot": -1}, {"goals": 1, "dist": -10}])
+def test_results_out_of_range_are_rejected(api, side):
+    client = TestClient(api.app)
+    before = match_count(api)
+    body = {"date": "2025-10-04", "home_id": 1, "away_id": 2, "home": side, "away": {"goals": 0}}
+    assert client.post("/results", json=body).status_code == 422
+    assert match_count(api) == before
+    assert api.live_results == []
+
+
+def test_batch_in_request_order_like_single_predictions(api):
+    client = TestClient(api.app)
+    ids = [t["team_id"] for t in client.get("/matrix").json()["teams"]]
+    fixtures = [(ids[3], ids[0]), (ids[0], ids[3]), (999, ids[1]), (ids[5], ids[9]), (ids[1], 999), (ids[3], ids[0])]
+    body = {"fixtures": [{"home_id": h, "away_id": a} for h, a in fixtures], "include_stats": True}
+    results = client.post("/predict/batch", json=body).json()["results"]
+
+    assert [(r["home_id"], r["away_id"]) for r in results] == fixtures
+    for (h, a), r in zip(fixtures, results):
+        single = client.get(f"/predict/{h}/{a}").json()
+        assert {k: v for k, v in r.items() if k not in ("home_id", "away_id")} == single
+    assert results[2] == {"home_id": 999, "away_id": ids[1], "error": "Insufficient data"}
+
+
+def test_embedded_scoring_matches_the_api(api):
+    # The Streamlit app's embedded mode calls the Predictor directly, http mode reads /matrix then /predict
+    client = TestClient(api.app)
+    matrix = client.get("/matrix").json()
+    ids = [t["team_id"] for t in matrix["teams"]]
+    for i, h in enumerate(ids):
+        for j, a in enumerate(ids):
+            if h == a:
+                continue
+            response = client.get(f"/predict/{h}/{a}").json()
+            assert api.current.predict_match(h, a) == response
+            assert matrix["prediction"][i][j] == response["prediction"]
+            assert {k: matrix[k][i][j] for k in ["away", "draw", "home"]} == response["probs"]
+            assert matrix["stats"][str(h)] == response["stats"]["home"]
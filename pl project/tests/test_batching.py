@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batching import MicroBatcher
+
+
+def test_every_caller_gets_its_own_result():
+    seen = []
+
+    def score(items):
+        seen.append(len(items))
+        time.sleep(0.002) # Long enough for the next requests to queue up behind this batch
+        return [item * 10 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(score, max_batch=16, max_wait=0.001)
+
+        async def caller(i):
+            await asyncio.sleep(i % 7 * 0.0005)
+            return i, await batcher.submit(i)
+
+        return batcher, await asyncio.gather(*(caller(i) for i in range(300)))
+
+    batcher, results = asyncio.run(run())
+    assert all(result == i * 10 for i, result in results)
+    assert sum(seen) == 300 and max(seen) <= 16
+    assert len(seen) < 300 # Requests really were scored together
+    assert batcher.stats()["pending"] == 0
+
+
+def test_a_failed_batch_fails_each_of_its_callers():
+    def score(items):
+        raise RuntimeError("forest failed")
+
+    async def run():
+        batcher = MicroBatcher(score)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
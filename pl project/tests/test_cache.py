@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from conftest import ingest, generate_matches, load_api
+from cache import PredictionCache, file_fingerprint
+
+
+def test_lru_eviction_and_counters():
+    cache = PredictionCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1 # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_fingerprint_follows_contents(tmp_path):
+    path = str(tmp_path / "model")
+    with open(path, "wb") as f:
+        f.write(b"one")
+    first = file_fingerprint(path)
+    with open(path, "wb") as f:
+        f.write(b"two")
+    assert file_fingerprint(path) != first
+
+
+def test_retrain_never_serves_an_old_prediction(project, monkeypatch):
+    matches = generate_matches()
+    first = pd.to_datetime(matches["date"]) <= pd.Timestamp("2025-09-01")
+    ingest(project, matches[first], "first")
+    project.full_rebuild()
+    api = load_api(project, monkeypatch)
+    client = TestClient(api.app)
+
+    home, away = [t["team_id"] for t in client.get("/matrix").json()["teams"][:2]]
+    old = client.get(f"/predict/{home}/{away}").json()
+    assert client.get(f"/predict/{home}/{away}").json() == old
+    before = client.get("/cache").json()
+    assert before["hits"] == 1
+
+    # New matches, retrained: new fingerprints, so the cached entry can't be hit
+    ingest(project, matches[~first], "rest")
+    project.incremental_update()
+    assert api.reload_resources()
+    after = client.get("/cache").json()
+    assert (after["model"], after["features"]) != (before["model"], before["features"])
+    new = client.get(f"/predict/{home}/{away}").json()
+    assert client.get("/cache").json()["hits"] == before["hits"]
+    assert new == api.current.predict_match(home, away)
+    assert new["stats"] != old["stats"]
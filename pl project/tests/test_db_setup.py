@@ -0,0 +1,46 @@
+import pandas as pd
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.db_setup import create_schema, assign_team_ids, upsert_matches, TEAM_ALIASES, MATCH_COLUMNS
+
+
+def new_db():
+    conn = sqlite3.connect(":memory:")
+    create_schema(conn)
+    return conn
+
+
+def test_two_aliases_without_the_canonical_name():
+    conn = new_db()
+    known = {}
+    assert assign_team_ids(conn, known, ["Spurs", "Tottenham", "Arsenal"], TEAM_ALIASES) == 2
+    assert conn.execute("SELECT team_name FROM teams ORDER BY team_id").fetchall() == [("Arsenal",), ("Tottenham Hotspur",)]
+    assert set(known) == {"Arsenal", "Tottenham Hotspur"}
+
+
+def test_alias_and_canonical_name_together():
+    conn = new_db()
+    known = {}
+    assign_team_ids(conn, known, ["Man City", "Manchester City"], TEAM_ALIASES)
+    assert conn.execute("SELECT team_name FROM teams").fetchall() == [("Manchester City",)]
+
+    # A later chunk spelling the club either way adds nothing
+    assert assign_team_ids(conn, known, ["Man City", "Manchester City"], TEAM_ALIASES) == 0
+
+
+def match_rows(gf=2.0, xg=None):
+    rows = pd.DataFrame([{"date": "2025-08-16", "venue": "Home", "gf": gf, "ga": 1.0, "xg": xg, "home_team_id": 1, "away_team_id": 2},
+                         {"date": "2025-08-16", "venue": "Away", "gf": 1.0, "ga": gf, "xga": xg, "home_team_id": 2, "away_team_id": 1}])
+    return rows.reindex(columns=list(MATCH_COLUMNS))
+
+
+def test_upsert_writes_only_new_or_changed_rows():
+    conn = new_db()
+    assert upsert_matches(conn, match_rows()) == 2
+    assert upsert_matches(conn, match_rows()) == 0 # Same values, NULLs included
+    assert upsert_matches(conn, match_rows(gf=3.0)) == 2
+    assert upsert_matches(conn, match_rows(gf=3.0, xg=1.4)) == 2
+    assert conn.execute("SELECT COUNT(*), SUM(gf) FROM matches").fetchone() == (2, 4.0)
@@ -0,0 +1,64 @@
+import itertools
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sklearn.ensemble import RandomForestClassifier
+from packed_forest import PackedForest
+from explain import TreeExplainer
+
+
+def fitted_forest(n_features=5):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, n_features))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(size=400) > 0).astype(int) + (X[:, 3] > 1)
+    rf = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=1).fit(X, y)
+    return rf, rng.normal(size=(8, n_features))
+
+
+def expected_output(forest, x, subset):
+    """Path-dependent v(S): x's branch on features in S, cover-weighted average of both otherwise."""
+    def walk(node):
+        left, right = forest.children[node]
+        if left == node:
+            return forest.proba[node]
+        f = forest.feature[node]
+        if f in subset:
+            return walk(left if np.float32(x[f]) <= forest.threshold[node] else right)
+        return (forest.cover[left] * walk(left) + forest.cover[right] * walk(right)) / forest.cover[node]
+    return np.mean([walk(root) for root in forest.roots], axis=0)
+
+
+def brute_force_shap(forest, x):
+    n = len(x)
+    values = np.zeros((len(forest.classes_), n))
+    for i in range(n):
+        others = [j for j in range(n) if j != i]
+        for size in range(n):
+            weight = math.factorial(size) * math.factorial(n - size - 1) / math.factorial(n)
+            for subset in itertools.combinations(others, size):
+                values[:, i] += weight * (expected_output(forest, x, set(subset) | {i}) - expected_output(forest, x, set(subset)))
+    return values
+
+
+def test_exact_against_brute_force_and_additive():
+    rf, X = fitted_forest()
+    forest = PackedForest.from_sklearn(rf)
+    explainer = TreeExplainer(lambda: forest)
+    values = explainer.shap_values(X)
+
+    # base + contributions add up to predict_proba
+    assert np.abs(explainer.expected_value + values.sum(axis=2) - rf.predict_proba(X)).max() < 1e-12
+    assert np.allclose(explainer.expected_value, expected_output(forest, X[0], set()), atol=1e-12)
+    for x, v in zip(X[:3], values):
+        assert np.abs(v - brute_force_shap(forest, x)).max() < 1e-12
+
+
+def test_batches_match_single_rows():
+    rf, X = fitted_forest()
+    explainer = TreeExplainer(lambda: PackedForest.from_sklearn(rf), chunk=4)
+    batch = explainer.shap_values(X)
+    assert np.allclose(batch, np.stack([explainer.shap_values(x[None])[0] for x in X]), atol=1e-14)
@@ -0,0 +1,65 @@
+import numpy as np
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conftest import generate_matches
+from features import COLS, rolling_averages, rolling_column_names, save_feature_store, load_feature_frame
+
+
+def raw_matches():
+    df = generate_matches()
+    df["home_team_id"] = pd.factorize(df["team"], sort=True)[0] + 1
+    df["date"] = pd.to_datetime(df["date"])
+    # Some missing stats, which every window has to skip like rolling().mean() does
+    df.loc[df.sample(frac=0.05, random_state=0).index, "xg"] = np.nan
+    return df.sort_values("date")
+
+
+def old_rolling_averages(group, cols, new_cols):
+    # The per-team version train_rolling.py used before features.py
+    group = group.sort_values("date")
+    group[new_cols] = group[cols].rolling(3, closed="left", min_periods=1).mean()
+    return group.dropna(subset=new_cols)
+
+
+def test_window_3_matches_the_old_groupby_apply():
+    df = raw_matches()
+    new_cols = rolling_column_names(COLS)
+    old = df.groupby("home_team_id").apply(lambda x: old_rolling_averages(x, COLS, new_cols)).reset_index(drop=True)
+    new = rolling_averages(df)
+    # Same rows in the same order, same values to the bit
+    pd.testing.assert_frame_equal(new[old.columns], old, check_exact=True)
+
+
+def test_other_windows_per_team():
+    df = raw_matches()
+    new = rolling_averages(df)
+    for team, rows in new.groupby("home_team_id"):
+        history = df[df["home_team_id"] == team].sort_values("date", kind="mergesort").set_index("date")[COLS]
+        for window in (5, 10):
+            expected = history.rolling(window, closed="left", min_periods=1).mean().loc[rows["date"]]
+            assert np.allclose(rows[rolling_column_names(COLS, window)], expected, equal_nan=True)
+        season = df[df["home_team_id"] == team].sort_values("date", kind="mergesort")
+        expected = season.groupby("season")[COLS].transform(lambda s: s.expanding().mean().shift(1))
+        expected.index = season["date"]
+        assert np.allclose(rows[rolling_column_names(COLS, "season")], expected.loc[rows["date"]], equal_nan=True)
+
+
+def test_backtest_reads_the_typed_store_like_the_csv(trained):
+    import backtest
+    store_df, store_X, store_y = backtest.load_matrix(trained.store_path)
+    csv_df, csv_X, csv_y = backtest.load_matrix(trained.data_path)
+    assert np.array_equal(store_X, csv_X) and np.array_equal(store_y, csv_y)
+    assert backtest.matchweek_steps(store_df) == backtest.matchweek_steps(csv_df)
+
+
+def test_store_keeps_missing_rounds_missing(tmp_path):
+    rows = pd.DataFrame({"date": pd.to_datetime(["2025-08-16", "2025-08-17"]), "season": [2025, 2025],
+                         "round": pd.Categorical(["Matchweek 1", None]), "home_team_id": [1, 2], "target": [2, 0]})
+    save_feature_store(rows, str(tmp_path / "store.npy"))
+    loaded = load_feature_frame(str(tmp_path / "store.npy"))
+    assert loaded["round"].tolist()[0] == "Matchweek 1" and pd.isna(loaded["round"].tolist()[1])
+    assert isinstance(loaded["round"].dtype, pd.CategoricalDtype)
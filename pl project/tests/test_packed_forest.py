@@ -0,0 +1,30 @@
+import numpy as np
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sklearn.ensemble import RandomForestClassifier
+from packed_forest import PackedForest
+
+
+def fitted_forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 6))
+    y = (X[:, 0] + rng.normal(size=600) > 0).astype(int) + (X[:, 1] > 1)
+    return RandomForestClassifier(n_estimators=25, min_samples_split=10, random_state=1).fit(X, y), rng
+
+
+def test_bit_identical_to_sklearn(tmp_path):
+    rf, rng = fitted_forest()
+    X = rng.normal(size=(500, 6))
+    packed = PackedForest.from_sklearn(rf, "fp")
+    assert (packed.predict_proba(X) == rf.predict_proba(X)).all()
+    assert (packed.predict_proba(X[:1]) == rf.predict_proba(X[:1])).all()
+    assert (packed.predict(X) == rf.predict(X)).all()
+
+    # Also after a save / memory-mapped load, as the API reads it
+    packed.save(str(tmp_path / "packed"))
+    loaded = PackedForest.load(str(tmp_path / "packed"), mmap=True)
+    assert loaded.model_fp == "fp"
+    assert (loaded.predict_proba(X) == rf.predict_proba(X)).all()
+    assert (loaded.classes_ == rf.classes_).all()
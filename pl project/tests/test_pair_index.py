@@ -0,0 +1,56 @@
+import numpy as np
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from head_to_head import PairIndex, pair_keys
+
+
+def random_pairs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    keys = np.unique(pair_keys(rng.integers(0, 500, n), rng.integers(0, 500, n)))
+    return rng.permutation(keys)
+
+
+def test_lookup_matches_positions():
+    keys = random_pairs(5000)
+    index = PairIndex(keys)
+    assert (index.get_indexer(keys) == np.arange(len(keys))).all()
+    missing = pair_keys([600, 0, 499], [0, 600, 600])
+    assert (index.get_indexer(missing) == -1).all()
+    assert (PairIndex([]).get_indexer(keys[:3]) == -1).all()
+
+
+def test_append_numbers_new_keys_after_old_ones():
+    keys = random_pairs(1000)
+    old = PairIndex(keys[:800])
+    new = old.append(keys[800:])
+    assert (new.get_indexer(keys) == np.arange(len(keys))).all()
+    assert (old.get_indexer(keys[800:]) == -1).all() # The old version is untouched
+    assert len(old) == 800 and len(new) == len(keys)
+
+
+def test_first_lookups_from_many_threads():
+    # Every hot-swap publishes a new index that the micro-batcher's threads hit at once
+    keys = random_pairs(20000)
+    expected = np.arange(len(keys))
+    for trial in range(50):
+        index = PairIndex(keys)
+        start = threading.Barrier(8)
+        results, errors = [], []
+
+        def lookup():
+            start.wait()
+            try:
+                results.append(index.get_indexer(keys))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors, f"trial {trial}: {errors[0]!r}"
+        assert all((r == expected).all() for r in results)
@@ -0,0 +1,43 @@
+import numpy as np
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features import feature_source
+from predictor import Predictor, PACKED_MAX_ROWS
+
+
+def load(trained, packed=True):
+    return Predictor(trained.model_path, feature_source(trained.store_path, trained.data_path),
+                     packed_path=trained.packed_path if packed else None, ratings_path=trained.ratings_path,
+                     db_path=trained.db_path, explain_path=None)
+
+
+def every_pairing(res):
+    ids = np.flatnonzero(res.team_pos >= 0)
+    home, away = np.repeat(ids, len(ids)), np.tile(ids, len(ids))
+    return home[home != away], away[home != away]
+
+
+def test_small_batches_never_load_the_sklearn_model(trained):
+    res = load(trained)
+    assert res.evaluator == "packed"
+    home, away = every_pairing(res)
+    small = res.predict_probabilities(home[:PACKED_MAX_ROWS], away[:PACKED_MAX_ROWS])[0]
+    assert not res.sklearn.loaded
+
+    # A large batch goes to sklearn, loaded now, and agrees bit for bit with the packed forest
+    assert len(home) > PACKED_MAX_ROWS
+    large = res.predict_probabilities(home, away)[0]
+    assert res.sklearn.loaded
+    assert (large[:PACKED_MAX_ROWS] == small).all()
+    inputs = res.model_inputs(home, away, res.team_rows(home), np.empty((len(home), len(res.predictors))))
+    assert (res.packed.predict_proba(inputs) == large).all()
+
+
+def test_without_packed_export(trained):
+    res, plain = load(trained), load(trained, packed=False)
+    assert plain.evaluator == "sklearn" and plain.sklearn.loaded
+    assert plain.predictors == res.predictors
+    home, away = every_pairing(plain)
+    assert (plain.predict_probabilities(home[:5], away[:5])[0] == res.predict_probabilities(home[:5], away[:5])[0]).all()
@@ -0,0 +1,31 @@
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from live import result_rows
+from ratings import Ratings
+
+
+def result(day, home, away, hg, ag):
+    return result_rows(datetime.date(2025, 10, day), home, away, {"goals": hg}, {"goals": ag})
+
+
+def test_same_day_results_each_apply_once(tmp_path):
+    ratings = Ratings()
+    ratings.process(result(4, 1, 2, 2, 0))
+    second = result(4, 8, 9, 1, 0)
+    assert len(ratings.unprocessed(second)) == 2 # Same day as the last one, not seen yet
+    ratings.process(ratings.unprocessed(second))
+    assert ratings.elo[8] > ratings.elo[9]
+
+    # Already processed (either match row), or older than the last date: nothing to apply
+    assert ratings.unprocessed(second).empty
+    assert ratings.unprocessed(result(4, 1, 2, 2, 0)).empty
+    assert ratings.unprocessed(result(3, 5, 6, 1, 1)).empty
+
+    # And that survives a save / load, like the API reloading after a retrain
+    ratings.save(str(tmp_path / "ratings.npz"))
+    loaded = Ratings.load(str(tmp_path / "ratings.npz"))
+    assert loaded.unprocessed(second).empty
+    assert len(loaded.unprocessed(result(4, 5, 6, 1, 1))) == 2
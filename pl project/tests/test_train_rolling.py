@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conftest import ingest, generate_matches
+from head_to_head import H2H_FEATURES
+from predictor import Predictor
+
+
+def split_at(matches, day):
+    """(rows up to `day`, rows after it)."""
+    on_or_before = pd.to_datetime(matches["date"]) <= day
+    return matches[on_or_before], matches[~on_or_before]
+
+
+def test_incremental_appends_what_a_full_rebuild_builds(project, capsys):
+    matches = generate_matches()
+    first, rest = split_at(matches, pd.Timestamp("2025-09-01"))
+    ingest(project, first, "first")
+    project.full_rebuild()
+
+    ingest(project, rest, "rest")
+    project.incremental_update()
+    assert "Appended" in capsys.readouterr().out
+    assert project.check_consistency()
+
+    # Nothing new: the last day is read again but every row of it is already in
+    project.incremental_update()
+    assert "already up to date" in capsys.readouterr().out
+
+
+def test_late_fixture_on_the_last_processed_day(project):
+    matches = generate_matches()
+    first, rest = split_at(matches, pd.Timestamp("2025-09-01"))
+    last_day = first["date"].max()
+    # One fixture of the last day (both team rows) only reaches the database afterwards
+    late_round = first[first["date"] == last_day].iloc[0]
+    late = (first["date"] == last_day) & first["team"].isin([late_round["team"], late_round["opponent"]])
+    ingest(project, first[~late], "first")
+    project.full_rebuild()
+
+    ingest(project, pd.concat([first[late], rest]), "rest")
+    project.incremental_update()
+    assert project.check_consistency()
+
+
+def test_merged_team_ids_force_a_full_rebuild(project, capsys):
+    matches = generate_matches()
+    # The club is spelled differently from October on, so it first gets a second id
+    renamed = pd.to_datetime(matches["date"]) >= pd.Timestamp("2024-10-01")
+    for col in ["team", "opponent"]:
+        matches.loc[renamed & (matches[col] == "L0000 Team 05"), col] = "Team Five"
+    ingest(project, matches, "matches")
+    project.full_rebuild()
+    stale_state = pd.read_csv(project.state_path)
+
+    conn = sqlite3.connect(project.db_path)
+    conn.execute("INSERT INTO team_aliases (alias, team_name) VALUES ('Team Five', 'L0000 Team 05')")
+    conn.commit()
+    conn.close()
+    ingest(project, matches, "matches")
+    assert not os.path.exists(project.state_path) # Removed along with the merge
+
+    # State from before the merge is refused even if it's still there
+    stale_state.to_csv(project.state_path, index=False)
+    project.incremental_update()
+    assert "no longer in the database" in capsys.readouterr().out
+    assert project.check_consistency()
+    assert len(project.load_state()["home_team_id"].unique()) == 20
+
+
+def test_head_to_head_inputs_are_opt_in(project):
+    ingest(project, generate_matches(), "matches")
+    project.full_rebuild()
+    res = Predictor(project.model_path, project.data_path, packed_path=project.packed_path,
+                    ratings_path=project.ratings_path, db_path=project.db_path, explain_path=None)
+    assert not set(H2H_FEATURES) & set(res.predictors) and res.h2h_index is None
+
+    # The head-to-head table and columns are there anyway, so opting in is just a retrain
+    assert set(H2H_FEATURES) <= set(pd.read_csv(project.data_path, nrows=0).columns)
+    project.predictors = project.model_predictors(head_to_head=True)
+    project.full_rebuild()
+    res = Predictor(project.model_path, project.data_path, packed_path=project.packed_path,
+                    ratings_path=project.ratings_path, db_path=project.db_path, explain_path=None)
+    assert set(H2H_FEATURES) <= set(res.predictors) and res.h2h_index is not None